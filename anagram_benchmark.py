@@ -0,0 +1,244 @@
+import json, os, statistics, subprocess, sys, tempfile, time
+import anagram_dictionary
+import anagram_solver
+import anagram_solver_advanced
+
+# Compare the anagram solvers on the same dictionary and query sets.
+#
+# Every solver runs in its own child process so that its peak memory is not
+# mixed with the harness's:
+#
+#   best_word:           anagram_solver.best_word (Homework #2).
+#   best_words:          anagram_solver.best_words (Homework #3).
+#   best_words_advanced: anagram_solver_advanced.best_words_advanced.
+#   best_word_cc:        anagram_solver.cc (Homework #2), compiled with g++.
+#
+# The peak memory is the RSS high-water mark of the solver's own process. It
+# cannot be read from the rusage of a child of the harness: on Linux a child
+# starts with the high-water mark of its parent, and exec does not reset it.
+# The Python children read VmHWM from /proc/self/status themselves, and
+# anagram_solver.cc is run through peak_rss.c, a small exec wrapper.
+#
+# The Python solvers are timed per query inside the child, after the
+# dictionary is loaded. anagram_solver.cc does not time itself, so its load
+# time is measured by a run with no queries and the rest of a full run is
+# divided evenly between the queries. Both are the fastest of CC_REPEAT runs
+# because the difference is small for short dataset files.
+#
+# For every (solver, dataset file) the harness records the latency of the
+# queries, the throughput, the peak memory and the quality of the answers
+# (the score of the answers / get_score(query)). The results are printed as a
+# table and appended to an output file as JSON lines, one per (solver,
+# dataset file), so that runs can be compared over time.
+
+SOLVERS = ['best_word', 'best_words', 'best_words_advanced', 'best_word_cc']
+CC_REPEAT = 5
+
+SOURCE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SOURCE_CC = os.path.join(SOURCE_DIRECTORY, 'anagram_solver.cc')
+SOURCE_PEAK_RSS = os.path.join(SOURCE_DIRECTORY, 'peak_rss.c')
+
+
+# Return the RSS high-water mark of this process in KiB.
+def peak_memory():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    raise RuntimeError("VmHWM is not in /proc/self/status")
+
+
+# Child process: run a Python |solver| on every query in |dataset_file| and
+# print {"load_seconds": ..., "peak_memory_kib": ...,
+# "queries": [[seconds, answers], ...]} as JSON.
+def run_worker(solver, word_file, dataset_file):
+    start = time.perf_counter()
+    compiled = anagram_dictionary.load(word_file)
+    if solver == 'best_words_advanced':
+        dictionary = anagram_solver_advanced.WordTable(compiled)
+    else:
+        dictionary = anagram_solver.Dictionary(compiled)
+    load_seconds = time.perf_counter() - start
+
+    results = []
+    for query in anagram_solver.read_words(dataset_file):
+        start = time.perf_counter()
+        if solver == 'best_word':
+            word = anagram_solver.best_word(dictionary, query)
+            answers = [word] if word is not None else []
+        elif solver == 'best_words':
+            answers = anagram_solver.best_words(dictionary, query)
+        else:
+            answers = anagram_solver_advanced.best_words_advanced(
+                dictionary, query)
+        results.append([time.perf_counter() - start, answers])
+    print(json.dumps({'load_seconds': load_seconds,
+                      'peak_memory_kib': peak_memory(),
+                      'queries': results}))
+
+
+# Run |command| and return (stdout, stderr, wall seconds).
+def run_child(command):
+    start = time.perf_counter()
+    child = subprocess.run(command, stdout=subprocess.PIPE,
+                           stderr=subprocess.PIPE)
+    seconds = time.perf_counter() - start
+    if child.returncode != 0:
+        raise RuntimeError("%s exited with %d: %s" % (
+            command[0], child.returncode, child.stderr.decode('utf-8')))
+    return (child.stdout.decode('utf-8'), child.stderr.decode('utf-8'),
+            seconds)
+
+
+# Compile |source| to |binary| with g++ unless it is up to date.
+def build(source, binary):
+    if (os.path.exists(binary) and
+            os.path.getmtime(binary) >= os.path.getmtime(source)):
+        return
+    subprocess.run(['g++', '-O2', '-o', binary, source], check=True)
+
+
+# Return the peak memory in KiB of |command| run through |peak_rss|.
+def run_peak_rss(peak_rss, command):
+    _, errors, _ = run_child([peak_rss] + command)
+    for line in errors.splitlines():
+        if line.startswith('peak_rss_kib '):
+            return int(line.split()[1])
+    raise RuntimeError("%s printed no peak_rss_kib" % peak_rss)
+
+
+# Return the answers of anagram_solver.cc for every query. It prints nothing
+# for a query without an answer, so its lines are matched to the queries in
+# order: a line belongs to the first query it can be constructed from. That
+# is exact because a query without an answer cannot construct any word.
+def align_cc_output(queries, lines):
+    answers = []
+    position = 0
+    for query in queries:
+        query_vector = anagram_solver.get_vector(query)
+        if (position < len(lines) and anagram_solver.can_construct(
+                anagram_solver.get_vector(lines[position]), query_vector)):
+            answers.append([lines[position]])
+            position += 1
+        else:
+            answers.append([])
+    assert(position == len(lines))
+    return answers
+
+
+# Run |solver| on |dataset_file| and return a list of (seconds, answers) per
+# query, the load seconds and the peak memory in KiB.
+# |binary|, |peak_rss|: The compiled anagram_solver.cc and peak_rss.c.
+def run_solver(solver, word_file, dataset_file, binary, peak_rss):
+    if solver == 'best_word_cc':
+        queries = anagram_solver.read_words(dataset_file)
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as empty:
+            load_seconds = min(
+                run_child([binary, word_file, empty.name])[2]
+                for _ in range(CC_REPEAT))
+        runs = [run_child([binary, word_file, dataset_file])
+                for _ in range(CC_REPEAT)]
+        output = runs[0][0]
+        seconds = min(run[2] for run in runs)
+        peak = run_peak_rss(peak_rss, [binary, word_file, dataset_file])
+        lines = output.splitlines()
+        query_seconds = max(seconds - load_seconds, 0) / max(len(queries), 1)
+        results = [(query_seconds, answers)
+                   for answers in align_cc_output(queries, lines)]
+        return (results, load_seconds, peak)
+
+    output, _, _ = run_child(
+        [sys.executable, os.path.abspath(__file__), '--worker', solver,
+         word_file, dataset_file])
+    worker = json.loads(output)
+    return ([tuple(result) for result in worker['queries']],
+            worker['load_seconds'], worker['peak_memory_kib'])
+
+
+# Return the p-th percentile of sorted |values|.
+def percentile(values, p):
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+# Summarize the results of one (solver, dataset file) as a dictionary.
+def summarize(solver, dataset_file, queries, results, load_seconds, peak):
+    latencies = sorted(seconds for seconds, _ in results)
+    total_seconds = sum(latencies)
+    qualities = []
+    for query, (_, answers) in zip(queries, results):
+        query_score = anagram_solver.get_score(query)
+        score = sum(anagram_solver.get_score(word) for word in answers)
+        qualities.append(score / query_score if query_score else 1.0)
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'solver': solver,
+        'dataset': dataset_file,
+        'queries': len(queries),
+        'load_seconds': load_seconds,
+        'total_seconds': total_seconds,
+        'queries_per_second':
+            len(queries) / total_seconds if total_seconds else 0,
+        'latency_mean': total_seconds / len(queries) if queries else 0,
+        'latency_p50': percentile(latencies, 50),
+        'latency_p95': percentile(latencies, 95),
+        'latency_max': latencies[-1] if latencies else 0,
+        'peak_memory_kib': peak,
+        'quality_mean': statistics.mean(qualities) if qualities else 0,
+        'quality_min': min(qualities) if qualities else 0,
+    }
+
+
+def print_table(summaries):
+    print("%-20s %-16s %7s %8s %10s %10s %10s %10s %9s %7s %7s" % (
+        'solver', 'dataset', 'queries', 'load(s)', 'queries/s', 'mean(ms)',
+        'p95(ms)', 'max(ms)', 'peak(MB)', 'quality', 'min'))
+    for s in summaries:
+        print("%-20s %-16s %7d %8.2f %10.1f %10.3f %10.3f %10.3f %9.1f "
+              "%7.3f %7.3f" % (
+                  s['solver'], os.path.basename(s['dataset']), s['queries'],
+                  s['load_seconds'], s['queries_per_second'],
+                  1000 * s['latency_mean'], 1000 * s['latency_p95'],
+                  1000 * s['latency_max'], s['peak_memory_kib'] / 1024,
+                  s['quality_mean'], s['quality_min']))
+
+
+# Run |solvers| on every file in |dataset_files| with |word_file|, print the
+# table and append the summaries to |output_file| as JSON lines.
+# |binary|, |peak_rss|: The paths of the compiled anagram_solver.cc and
+# peak_rss.c.
+def benchmark(word_file, dataset_files, output_file, solvers=SOLVERS,
+              binary='anagram_solver_cc', peak_rss='peak_rss'):
+    # Compile the dictionary once, so that no child compiles it.
+    anagram_dictionary.load(word_file)
+    if 'best_word_cc' in solvers:
+        build(SOURCE_CC, binary)
+        build(SOURCE_PEAK_RSS, peak_rss)
+        binary = os.path.abspath(binary)
+        peak_rss = os.path.abspath(peak_rss)
+
+    summaries = []
+    for dataset_file in dataset_files:
+        queries = anagram_solver.read_words(dataset_file)
+        for solver in solvers:
+            results, load_seconds, peak = run_solver(
+                solver, word_file, dataset_file, binary, peak_rss)
+            assert(len(results) == len(queries))
+            summaries.append(summarize(solver, dataset_file, queries,
+                                       results, load_seconds, peak))
+    print_table(summaries)
+    with open(output_file, 'a') as file:
+        for summary in summaries:
+            file.write(json.dumps(summary) + '\n')
+    return summaries
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == '--worker':
+        run_worker(sys.argv[2], sys.argv[3], sys.argv[4])
+    elif len(sys.argv) >= 4:
+        benchmark(sys.argv[1], sys.argv[3:], sys.argv[2])
+    else:
+        print("usage: %s word_file output_file dataset_file..." % sys.argv[0])
+        exit(1)
@@ -0,0 +1,142 @@
+import asyncio, socket, sys
+import anagram_dictionary
+import anagram_match
+import anagram_solver
+import anagram_solver_advanced
+
+# A long-lived anagram server. The dictionary is read and preprocessed once
+# when the server starts, and queries are served over a local Unix socket.
+#
+# Protocol: a client sends one request per line and receives one response
+# line per request, in order:
+#
+#   request:  "<command> <query>\n"
+#   response: "<word> <word> ...\n" (an empty line if no word is found), or
+#             "error: <message>\n"
+#
+# Commands:
+#   match:               The words that are exact anagrams of the query.
+#   best_word:           anagram_solver.best_word (Homework #2).
+#   best_words:          anagram_solver.best_words (Homework #3).
+#   best_words_advanced: anagram_solver_advanced.best_words_advanced.
+#
+# Each connection is served by its own task, so many clients can be connected
+# at the same time. The queries are answered in a thread pool so that a long
+# search does not block the other connections from being accepted and read.
+
+
+# The dictionary state shared by all connections.
+class Server:
+    # |word_file|: The path of the word file.
+    def __init__(self, word_file):
+        self.index = anagram_match.open_index(word_file)
+        compiled = anagram_dictionary.load(word_file)
+        self.dictionary = anagram_solver.Dictionary(compiled)
+        self.advanced_table = anagram_solver_advanced.WordTable(compiled)
+
+    # Answer one request line and return the response line.
+    def answer(self, line):
+        command, _, query = line.partition(' ')
+        if command == 'match':
+            words = anagram_match.match(self.index, query)
+        elif command == 'best_word':
+            word = anagram_solver.best_word(self.dictionary, query)
+            words = [word] if word is not None else []
+        elif command == 'best_words':
+            words = anagram_solver.best_words(self.dictionary, query)
+        elif command == 'best_words_advanced':
+            words = anagram_solver_advanced.best_words_advanced(
+                self.advanced_table, query)
+        else:
+            return 'error: unknown command "%s"' % command
+        return ' '.join(words)
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.decode('utf-8').rstrip('\n')
+                try:
+                    response = await loop.run_in_executor(
+                        None, self.answer, line)
+                except Exception as error:
+                    response = 'error: %s' % error
+                writer.write((response + '\n').encode('utf-8'))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def run_server(word_file, socket_path):
+    server = Server(word_file)
+    unix_server = await asyncio.start_unix_server(server.handle, socket_path)
+    print("Serving %s on %s" % (word_file, socket_path), file=sys.stderr)
+    async with unix_server:
+        await unix_server.serve_forever()
+
+
+def serve(word_file, socket_path):
+    try:
+        asyncio.run(run_server(word_file, socket_path))
+    except KeyboardInterrupt:
+        pass
+
+
+# Client: send |command| for every query in |queries| and yield the responses
+# in order. Requests are pipelined |window| at a time so that neither side
+# blocks on a full socket buffer.
+def request(socket_path, command, queries, window=64):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(socket_path)
+    reader = client.makefile('r', encoding='utf-8', newline='\n')
+    pending = 0
+    batch = []
+    for query in queries:
+        batch.append('%s %s\n' % (command, query))
+        if len(batch) >= window:
+            client.sendall(''.join(batch).encode('utf-8'))
+            pending += len(batch)
+            batch = []
+            while pending:
+                yield reader.readline().rstrip('\n')
+                pending -= 1
+    if batch:
+        client.sendall(''.join(batch).encode('utf-8'))
+        pending += len(batch)
+        while pending:
+            yield reader.readline().rstrip('\n')
+            pending -= 1
+    reader.close()
+    client.close()
+
+
+# Send the queries in |query_file| (stdin if None or "-") and print the
+# responses, one line per query.
+def main_client(socket_path, command, query_file=None):
+    if query_file is None or query_file == '-':
+        queries = sys.stdin
+    else:
+        queries = open(query_file)
+    for response in request(socket_path, command,
+                            (line.rstrip('\n') for line in queries)):
+        print(response)
+    if queries is not sys.stdin:
+        queries.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "serve":
+        serve(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) in (4, 5) and sys.argv[1] == "query":
+        main_client(sys.argv[2], sys.argv[3],
+                    sys.argv[4] if len(sys.argv) == 5 else None)
+    else:
+        print("usage: %s serve word_file socket_path" % sys.argv[0])
+        print("       %s query socket_path command [query_file]" % sys.argv[0])
+        print("command: match, best_word, best_words or best_words_advanced")
+        exit(1)
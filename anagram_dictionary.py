@@ -0,0 +1,275 @@
+import mmap, os, struct, sys, tempfile
+from array import array
+import anagram_words
+
+# Compiled dictionary:
+#
+# anagram_solver.py and anagram_solver_advanced.py need the same derived data
+# for every word: the occurrence vector, the score, the length and the SWAR
+# bitmask, plus the words sorted in the orders the solvers search them. The
+# compile step calculates them once and writes them next to the word file as
+# "<word_file>.compiled", so that the solvers only have to read and unpack it.
+#
+# File format (little endian):
+#
+# ---------------------------------------------------------------------------
+# | header | section table | sections                                       |
+# ---------------------------------------------------------------------------
+#
+# The header records the size and the mtime of the word file the dictionary
+# was compiled from. load() compiles the file again when they do not match
+# the word file. The section table stores (offset, length) of each section in
+# SECTIONS. The per-word sections are in the order of the word file:
+#
+#   words:                 The words separated by "\n" (UTF-8).
+#   vectors:               26 uint8 occurrence counts per word.
+#   scores:                uint32 per word.
+#   lengths:               uint32 per word.
+#   bitmasks:              BITMASK_BYTES bytes per word.
+#   order_by_score:        uint32 word positions in the reverse order of
+#                          scores (anagram_solver, Homework #2).
+#   order_by_length:       uint32 word positions in the reverse order of
+#                          lengths (anagram_solver, Homework #3).
+#   order_by_length_score: uint32 word positions in the reverse order of
+#                          (length, score) (anagram_solver_advanced).
+#   letters:               For each word in |order_by_length|, the distinct
+#                          characters, separated by LETTERS_SEPARATOR.
+#   fits:                  For each character, the number of sets followed by
+#                          the sets of anagram_solver.SubmultisetIndex.fits.
+COMPILED_MAGIC = b'ANAGDIC1'
+COMPILED_HEADER = struct.Struct('<8sQQQ')
+SECTIONS = ['words', 'vectors', 'scores', 'lengths', 'bitmasks',
+            'order_by_score', 'order_by_length', 'order_by_length_score',
+            'letters', 'fits']
+SECTION_TABLE = struct.Struct('<%dQ' % (2 * len(SECTIONS)))
+# 26 characters x BITS_PER_CHAR bits = 182 bits.
+BITMASK_BYTES = 24
+LETTERS_SEPARATOR = b'\xff'
+
+assert(array('I').itemsize == 4)
+
+
+# The preprocessed data of a word file. The per-word lists are in the order
+# of the word file.
+#
+# |self.words|: The words.
+# |self.vectors|: The occurrence vectors (lists, or bytes when read from the
+#                 compiled file).
+# |self.scores|: The scores.
+# |self.lengths|: The lengths.
+# |self.bitmasks|: The SWAR bitmasks (anagram_words.get_bitmask).
+# |self.order_by_score|, |self.order_by_length|, |self.order_by_length_score|:
+#     The word positions in the orders described above.
+# |self.letters|, |self.fits|: anagram_solver.SubmultisetIndex.letters and
+#     .fits of the vectors in |self.order_by_length|.
+class CompiledDictionary:
+    pass
+
+
+# Calculate the compiled dictionary of |words|.
+def build(words):
+    # anagram_solver imports this module, so it is imported here rather than
+    # at the top.
+    import anagram_solver
+
+    compiled = CompiledDictionary()
+    compiled.words = words
+    compiled.vectors = [anagram_words.get_vector(word) for word in words]
+    compiled.scores = [anagram_words.get_score(word) for word in words]
+    compiled.lengths = [len(word) for word in words]
+    compiled.bitmasks = [anagram_words.get_bitmask(word) for word in words]
+    scores = compiled.scores
+    lengths = compiled.lengths
+    compiled.order_by_score = sorted(
+        range(len(words)), key=lambda i: scores[i], reverse=True)
+    compiled.order_by_length = sorted(
+        range(len(words)), key=lambda i: lengths[i], reverse=True)
+    compiled.order_by_length_score = sorted(
+        range(len(words)), key=lambda i: (lengths[i], scores[i]),
+        reverse=True)
+    index = anagram_solver.SubmultisetIndex(
+        [compiled.vectors[i] for i in compiled.order_by_length])
+    compiled.letters = index.letters
+    compiled.fits = index.fits
+    return compiled
+
+
+# Write |compiled| (compiled from |word_file|) to |compiled_file|.
+def write(compiled, word_file, compiled_file):
+    stat = os.stat(word_file)
+    size = len(compiled.words)
+    set_bytes = (size + 7) // 8
+    letters = LETTERS_SEPARATOR.join(
+        bytes(word_letters) for word_letters in compiled.letters)
+    fits = bytearray()
+    for fits_k in compiled.fits:
+        fits.append(len(fits_k))
+        for bits in fits_k:
+            fits.extend(bits.to_bytes(set_bytes, 'little'))
+    sections = {
+        'words': '\n'.join(compiled.words).encode('utf-8'),
+        'vectors': bytes(count for vector in compiled.vectors
+                         for count in vector),
+        'scores': array('I', compiled.scores).tobytes(),
+        'lengths': array('I', compiled.lengths).tobytes(),
+        'bitmasks': b''.join(bitmask.to_bytes(BITMASK_BYTES, 'little')
+                             for bitmask in compiled.bitmasks),
+        'order_by_score': array('I', compiled.order_by_score).tobytes(),
+        'order_by_length': array('I', compiled.order_by_length).tobytes(),
+        'order_by_length_score':
+            array('I', compiled.order_by_length_score).tobytes(),
+        'letters': letters,
+        'fits': bytes(fits),
+    }
+    table = []
+    offset = COMPILED_HEADER.size + SECTION_TABLE.size
+    for name in SECTIONS:
+        table += [offset, len(sections[name])]
+        offset += len(sections[name])
+
+    # Write to a temporary file and rename it so that a reader never sees a
+    # partially written file. The temporary file gets a unique name so that
+    # concurrent writers do not write to the same file.
+    descriptor, temporary_file = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(compiled_file)), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(COMPILED_HEADER.pack(
+                COMPILED_MAGIC, stat.st_size, stat.st_mtime_ns, size))
+            file.write(SECTION_TABLE.pack(*table))
+            for name in SECTIONS:
+                file.write(sections[name])
+        os.replace(temporary_file, compiled_file)
+    except BaseException:
+        os.remove(temporary_file)
+        raise
+
+
+# Read |compiled_file|. Return None if it was not compiled from the current
+# |word_file|, or if it is truncated or corrupt.
+def read(compiled_file, word_file):
+    stat = os.stat(word_file)
+    with open(compiled_file, 'rb') as file:
+        # A file shorter than the header is truncated, and an empty file
+        # cannot be mapped.
+        if (os.fstat(file.fileno()).st_size <
+                COMPILED_HEADER.size + SECTION_TABLE.size):
+            return None
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, source_size, source_mtime, size = \
+                COMPILED_HEADER.unpack_from(data, 0)
+            if (magic != COMPILED_MAGIC or source_size != stat.st_size or
+                    source_mtime != stat.st_mtime_ns):
+                return None
+            table = SECTION_TABLE.unpack_from(data, COMPILED_HEADER.size)
+            sections = {}
+            for i, name in enumerate(SECTIONS):
+                offset, length = table[2 * i], table[2 * i + 1]
+                if offset + length > len(data):
+                    return None
+                sections[name] = data[offset:offset + length]
+
+    # The per-word sections must have |size| entries.
+    entry_bytes = {'vectors': 26, 'scores': 4, 'lengths': 4,
+                   'bitmasks': BITMASK_BYTES, 'order_by_score': 4,
+                   'order_by_length': 4, 'order_by_length_score': 4}
+    for name, entry_size in entry_bytes.items():
+        if len(sections[name]) != entry_size * size:
+            return None
+
+    def read_array(section):
+        values = array('I')
+        values.frombytes(sections[section])
+        return values.tolist()
+
+    compiled = CompiledDictionary()
+    try:
+        compiled.words = sections['words'].decode('utf-8').split('\n')
+    except UnicodeDecodeError:
+        return None
+    if size == 0:
+        compiled.words = []
+    if len(compiled.words) != size:
+        return None
+    vectors = sections['vectors']
+    compiled.vectors = [vectors[i * 26:(i + 1) * 26] for i in range(size)]
+    compiled.scores = read_array('scores')
+    compiled.lengths = read_array('lengths')
+    bitmasks = sections['bitmasks']
+    compiled.bitmasks = [
+        int.from_bytes(bitmasks[i * BITMASK_BYTES:(i + 1) * BITMASK_BYTES],
+                       'little') for i in range(size)]
+    compiled.order_by_score = read_array('order_by_score')
+    compiled.order_by_length = read_array('order_by_length')
+    compiled.order_by_length_score = read_array('order_by_length_score')
+    for order in (compiled.order_by_score, compiled.order_by_length,
+                  compiled.order_by_length_score):
+        if size and max(order) >= size:
+            return None
+
+    compiled.letters = sections['letters'].split(LETTERS_SEPARATOR)
+    if size == 0:
+        compiled.letters = []
+    if (len(compiled.letters) != size or sections['letters'].translate(
+            None, bytes(range(26)) + LETTERS_SEPARATOR)):
+        return None
+
+    fits = sections['fits']
+    set_bytes = (size + 7) // 8
+    compiled.fits = []
+    offset = 0
+    for k in range(26):
+        if offset >= len(fits):
+            return None
+        count = fits[offset]
+        offset += 1
+        if offset + count * set_bytes > len(fits):
+            return None
+        fits_k = []
+        for c in range(count):
+            fits_k.append(int.from_bytes(fits[offset:offset + set_bytes],
+                                         'little'))
+            offset += set_bytes
+        compiled.fits.append(fits_k)
+    if offset != len(fits):
+        return None
+    return compiled
+
+
+# Return the path of the compiled file of a given word file.
+def compiled_path(word_file):
+    return word_file + '.compiled'
+
+
+# Compile |word_file| and write the compiled file.
+def compile_dictionary(word_file):
+    compiled = build(anagram_words.read_words(word_file))
+    write(compiled, word_file, compiled_path(word_file))
+    return compiled
+
+
+# Return the compiled dictionary of |word_file|. The compiled file is read if
+# it is up to date, and compiled again otherwise. If the compiled file cannot
+# be written (e.g. the directory is read-only), the dictionary is only
+# compiled in memory.
+def load(word_file):
+    compiled_file = compiled_path(word_file)
+    if os.path.exists(compiled_file):
+        compiled = read(compiled_file, word_file)
+        if compiled is not None:
+            return compiled
+    compiled = build(anagram_words.read_words(word_file))
+    try:
+        write(compiled, word_file, compiled_file)
+    except OSError:
+        pass
+    return compiled
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: %s word_file..." % sys.argv[0])
+        exit(1)
+    for word_file in sys.argv[1:]:
+        compile_dictionary(word_file)
+        print("Compiled %s" % compiled_path(word_file))
@@ -1,4 +1,4 @@
-import sys
+import itertools, mmap, os, struct, sys, tempfile, time, zlib
 
 # Return a list of words in a given file.
 def read_words(file):
@@ -15,20 +15,344 @@ def sort(string):
     return ''.join(sorted(list(string)))
 
 
+# Signature index:
+#
+# The index maps the sorted-letter signature of every word to the words that
+# share the signature, so that a lookup is one hash probe instead of a scan of
+# the whole word file. It is stored next to the word file as
+# "<word_file>.index" and memory-mapped when it is opened:
+#
+# -----------------------------------------------------------------------
+# | header | bucket_count x uint64 offsets | records                    |
+# -----------------------------------------------------------------------
+#
+# The header records the size and the mtime of the word file the index was
+# built from. Each bucket stores the offset of a record (0 means the bucket is
+# empty) and collisions are resolved by linear probing. Each record is
+# "<signature>\t<word> <word> ...\n".
+INDEX_MAGIC = b'ANAGIDX1'
+INDEX_HEADER = struct.Struct('<8sQQQ')
+INDEX_OFFSET = struct.Struct('<Q')
+
+
+# Return the bucket of a given signature. zlib.crc32 is used instead of hash()
+# because the index must be valid across processes.
+def index_hash(signature, bucket_count):
+    return zlib.crc32(signature) % bucket_count
+
+
+# Return the path of the index file of a given word file.
+def index_path(word_file):
+    return word_file + '.index'
+
+
+# Build the index file of |word_file| at |index_file|.
+def build_index(word_file, index_file):
+    stat = os.stat(word_file)
+    signatures = {}
+    for word in read_words(word_file):
+        signature = sort(word).encode('utf-8')
+        signatures.setdefault(signature, []).append(word)
+
+    # Keep the load factor below 0.5 so that probe sequences stay short.
+    bucket_count = max(1, len(signatures) * 2)
+    buckets = [0] * bucket_count
+    records = []
+    offset = INDEX_HEADER.size + bucket_count * INDEX_OFFSET.size
+    for signature, words in signatures.items():
+        record = signature + b'\t' + ' '.join(words).encode('utf-8') + b'\n'
+        bucket = index_hash(signature, bucket_count)
+        while buckets[bucket]:
+            bucket = (bucket + 1) % bucket_count
+        buckets[bucket] = offset
+        records.append(record)
+        offset += len(record)
+
+    # Write to a temporary file and rename it so that a reader never sees a
+    # partially written index. The temporary file gets a unique name so that
+    # concurrent writers do not write to the same file.
+    descriptor, temporary_file = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(index_file)), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(INDEX_HEADER.pack(
+                INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, bucket_count))
+            file.write(struct.pack('<%dQ' % bucket_count, *buckets))
+            file.writelines(records)
+        os.replace(temporary_file, index_file)
+    except BaseException:
+        os.remove(temporary_file)
+        raise
+
+
+# A memory-mapped signature index.
+class SignatureIndex:
+    # |index_file|: The path of the index file. ValueError is raised if it is
+    # truncated or not an index file.
+    def __init__(self, index_file):
+        with open(index_file, 'rb') as file:
+            # An empty file cannot be mapped.
+            if os.fstat(file.fileno()).st_size < INDEX_HEADER.size:
+                raise ValueError("%s is not an index file" % index_file)
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.source_size, self.source_mtime,
+         self.bucket_count) = INDEX_HEADER.unpack_from(self.map, 0)
+        if (magic != INDEX_MAGIC or self.bucket_count == 0 or
+                INDEX_HEADER.size + self.bucket_count * INDEX_OFFSET.size >
+                len(self.map)):
+            self.map.close()
+            raise ValueError("%s is not an index file" % index_file)
+
+    # Return true if the index was built from the current |word_file|.
+    def is_fresh(self, word_file):
+        stat = os.stat(word_file)
+        return (stat.st_size == self.source_size and
+                stat.st_mtime_ns == self.source_mtime)
+
+    # Return the list of words whose sorted-letter signature is |signature|.
+    def lookup(self, signature):
+        signature = signature.encode('utf-8')
+        bucket = index_hash(signature, self.bucket_count)
+        # A valid table has an empty bucket, but a corrupt one may not.
+        for probe in range(self.bucket_count):
+            (offset,) = INDEX_OFFSET.unpack_from(
+                self.map, INDEX_HEADER.size + bucket * INDEX_OFFSET.size)
+            if offset == 0:
+                return []
+            end = offset + len(signature)
+            if (self.map[offset:end] == signature and
+                    self.map[end:end + 1] == b'\t'):
+                line_end = self.map.find(b'\n', end)
+                if line_end < 0:
+                    return []
+                return self.map[end + 1:line_end].decode(
+                    'utf-8', 'replace').split(' ')
+            bucket = (bucket + 1) % self.bucket_count
+        return []
+
+    def close(self):
+        self.map.close()
+
+
+# Open the index of |word_file|. The index is (re)built only when it does not
+# exist yet, is not a valid index file or the word file has changed since the
+# index was built.
+def open_index(word_file):
+    index_file = index_path(word_file)
+    if os.path.exists(index_file):
+        try:
+            index = SignatureIndex(index_file)
+        except ValueError:
+            index = None
+        if index is not None:
+            if index.is_fresh(word_file):
+                return index
+            index.close()
+    build_index(word_file, index_file)
+    return SignatureIndex(index_file)
+
+
+# Return the words in |index| that are anagrams of |string|, excluding
+# |string| itself.
+def match(index, string):
+    return [word for word in index.lookup(sort(string)) if word != string]
+
+
 def main(word_file, string):
-    sorted_string = sort(string)
-    words = read_words(word_file)
+    index = open_index(word_file)
     found = False
+    for word in match(index, string):
+        print("Found: %s" % word)
+        found = True
+    if not found:
+        print("Not found")
+    index.close()
+
+
+# Phrase anagrams:
+#
+# Find every combination of words that together use exactly the letters of
+# |string|. Words are grouped by their signature, so each group is searched
+# once and expanded to its words only when a phrase is reported.
+#
+# Letter-count index: the groups that fit in the query are numbered, and a set
+# of groups is a Python int used as a bitset. For each letter k,
+# |fits[k][c]| is the set of groups that contain letter k at most c times and
+# |contains[k]| is the set of groups that contain letter k. The groups that
+# fit in the remaining letters are then found with a few bitwise ANDs instead
+# of a scan over the dictionary.
+#
+# The search keeps a pool of the groups that still fit in the remaining
+# letters:
+#
+# 1. Pick the remaining letter that the fewest groups in the pool contain.
+#    Every phrase must use one of these groups, and if there is none the
+#    remaining letters cannot be used up.
+# 2. Try the groups containing that letter one by one. After a group has been
+#    tried it is removed from the pool of its siblings, so that every phrase
+#    is found exactly once.
+#
+# |max_words|: If not None, only phrases of at most |max_words| words are
+#              returned.
+# Return value: A generator of phrases (lists of words).
+def find_phrases(words, string, max_words=None):
+    letters = sorted(set(string))
+    position = {letter: i for i, letter in enumerate(letters)}
+    query_vector = [0] * len(letters)
+    for letter in string:
+        query_vector[position[letter]] += 1
+
+    # Group the words that fit in the query by their letter-count vector.
+    groups = {}
     for word in words:
-        if word != string and sort(word) == sorted_string:
-            print("Found: %s" % word)
-            found = True
+        if word == '' or len(word) > len(string):
+            continue
+        vector = [0] * len(letters)
+        for letter in word:
+            if letter not in position:
+                break
+            vector[position[letter]] += 1
+        else:
+            if all(vector[k] <= query_vector[k] for k in range(len(letters))):
+                groups.setdefault(tuple(vector), []).append(word)
+    vectors = list(groups.keys())
+    vector_to_group = {vector: i for i, vector in enumerate(vectors)}
+
+    # Build the letter-count index.
+    fits = []
+    contains = []
+    for k in range(len(letters)):
+        exact = [0] * (query_vector[k] + 1)
+        for i, vector in enumerate(vectors):
+            exact[vector[k]] |= 1 << i
+        fits_k = []
+        bits = 0
+        for c in range(query_vector[k] + 1):
+            bits |= exact[c]
+            fits_k.append(bits)
+        fits.append(fits_k)
+        contains.append(bits & ~exact[0])
+
+    def search(pool, remaining, remaining_length, chosen):
+        if remaining_length == 0:
+            yield list(chosen)
+            return
+        if max_words is not None:
+            if len(chosen) >= max_words:
+                return
+            if len(chosen) == max_words - 1:
+                # Only one more word is allowed, so it has to use up all the
+                # remaining letters.
+                group = vector_to_group.get(tuple(remaining))
+                if group is not None and (pool >> group) & 1:
+                    chosen.append(vectors[group])
+                    yield list(chosen)
+                    chosen.pop()
+                return
+
+        # Pick the remaining letter with the fewest groups to cover it.
+        best_letter = -1
+        best_count = -1
+        for k in range(len(letters)):
+            if remaining[k]:
+                count = (pool & contains[k]).bit_count()
+                if best_count < 0 or count < best_count:
+                    best_letter = k
+                    best_count = count
+        if best_count == 0:
+            return
+
+        candidates = pool & contains[best_letter]
+        while candidates:
+            low = candidates & -candidates
+            group = low.bit_length() - 1
+            candidates ^= low
+            vector = vectors[group]
+            new_remaining = list(remaining)
+            # The child pool keeps |group| itself because a phrase can use
+            # the same group more than once.
+            new_pool = pool
+            for k in range(len(letters)):
+                if vector[k]:
+                    new_remaining[k] -= vector[k]
+                    new_pool &= fits[k][new_remaining[k]]
+            chosen.append(vector)
+            yield from search(new_pool, new_remaining,
+                              remaining_length - sum(vector), chosen)
+            chosen.pop()
+            pool ^= low
+
+    all_groups = (1 << len(vectors)) - 1
+    for chosen in search(all_groups, query_vector, len(string), []):
+        # Expand the groups into words. A group used m times contributes
+        # every multiset of m of its words.
+        counts = {}
+        for vector in chosen:
+            counts[vector] = counts.get(vector, 0) + 1
+        parts = []
+        for vector, count in counts.items():
+            parts.append(list(itertools.combinations_with_replacement(
+                groups[vector], count)))
+        for combination in itertools.product(*parts):
+            phrase = [word for part in combination for word in part]
+            if phrase != [string]:
+                yield phrase
+
+
+# Print the phrase anagrams of |string|.
+def main_phrases(word_file, string, max_words=None):
+    found = False
+    for phrase in find_phrases(read_words(word_file), string, max_words):
+        print("Found: %s" % " ".join(phrase))
+        found = True
     if not found:
         print("Not found")
 
-        
+
+# Batch mode: open the index once and answer one query per line of
+# |query_file| (stdin if |query_file| is None or "-"). Results are written as
+# "<query>\tFound: <word>" or "<query>\tNot found" while the queries are read,
+# so memory use does not grow with the number of queries. A throughput
+# summary is printed to stderr at the end.
+def main_batch(word_file, query_file=None):
+    index = open_index(word_file)
+    if query_file is None or query_file == '-':
+        queries = sys.stdin
+    else:
+        queries = open(query_file)
+    query_count = 0
+    found_count = 0
+    begin = time.perf_counter()
+    for line in queries:
+        string = line.rstrip('\n')
+        query_count += 1
+        words = match(index, string)
+        for word in words:
+            sys.stdout.write("%s\tFound: %s\n" % (string, word))
+        if words:
+            found_count += 1
+        else:
+            sys.stdout.write("%s\tNot found\n" % string)
+    sys.stdout.flush()
+    elapsed = time.perf_counter() - begin
+    if queries is not sys.stdin:
+        queries.close()
+    index.close()
+    print("%d queries (%d found) in %.3f s: %.0f queries/s" % (
+        query_count, found_count, elapsed,
+        query_count / elapsed if elapsed > 0 else 0), file=sys.stderr)
+
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
+    if len(sys.argv) in (4, 5) and sys.argv[2] == "--phrases":
+        main_phrases(sys.argv[1], sys.argv[3],
+                     int(sys.argv[4]) if len(sys.argv) == 5 else None)
+    elif len(sys.argv) in (3, 4) and sys.argv[2] == "--batch":
+        main_batch(sys.argv[1], sys.argv[3] if len(sys.argv) == 4 else None)
+    elif len(sys.argv) == 3:
+        main(sys.argv[1], sys.argv[2])
+    else:
         print("usage: %s word_file string" % sys.argv[0])
+        print("       %s word_file --batch [query_file]" % sys.argv[0])
+        print("       %s word_file --phrases string [max_words]" % sys.argv[0])
         exit(1)
-    main(sys.argv[1], sys.argv[2])
@@ -0,0 +1,143 @@
+import collections, os, pickle, sys, tempfile
+import anagram_dictionary
+import anagram_solver
+import anagram_solver_advanced
+
+# Memoize the answers of the anagram solvers.
+#
+# The answer of every solver only depends on the multiset of the characters
+# in the query, so queries that are permutations of each other share one
+# answer. The answers are cached with the occurrence vector (anagram_solver)
+# or the SWAR bitmask (anagram_solver_advanced) of the query as the key.
+
+
+# A bounded cache that evicts the least recently used entry.
+#
+# |self.capacity|: The maximum number of entries.
+# |self.hits|, |self.misses|, |self.evictions|: Statistics.
+class ResultCache:
+    def __init__(self, capacity):
+        assert(capacity >= 1)
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Return (value, True) if |key| is cached, (None, False) otherwise.
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return (self.entries[key], True)
+        self.misses += 1
+        return (None, False)
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    # Save the entries to |file|. |tag| identifies what the entries are valid
+    # for, e.g. the solver and the word file. The entries are written to a
+    # uniquely named temporary file and renamed, so that concurrent savers do
+    # not write to the same file.
+    def save(self, file, tag):
+        descriptor, temporary_file = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(file)), suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                pickle.dump((tag, list(self.entries.items())), f)
+            os.replace(temporary_file, file)
+        except BaseException:
+            os.remove(temporary_file)
+            raise
+
+    # Load the entries saved by save(). Nothing is loaded if |file| does not
+    # exist or was saved with a different |tag|.
+    def load(self, file, tag):
+        if not os.path.exists(file):
+            return
+        with open(file, 'rb') as f:
+            saved_tag, items = pickle.load(f)
+        if saved_tag != tag:
+            return
+        for key, value in items:
+            self.put(key, value)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return ("%d hits, %d misses (hit rate %.1f%%), %d evictions, "
+                "%d entries" % (
+                    self.hits, self.misses,
+                    100 * self.hits / lookups if lookups else 0,
+                    self.evictions, len(self.entries)))
+
+
+# The solvers that can be memoized.
+SOLVERS = ['best_word', 'best_words', 'best_words_advanced']
+
+
+# Return the cache key of |query| for |solver|.
+def query_key(solver, query):
+    if solver == 'best_words_advanced':
+        return anagram_solver_advanced.get_bitmask(query)
+    return tuple(anagram_solver.get_vector(query))
+
+
+# Run |solver| on every query in |dataset_file| and print the answers, the
+# same as find_best_word, find_best_words and find_best_words_advanced, with
+# the answers memoized in a ResultCache of |capacity| entries.
+# |cache_file|: If not None, the cache is loaded from and saved to this file.
+# Return value: The ResultCache.
+def find_memoized(solver, word_file, dataset_file, capacity=100000,
+                  cache_file=None):
+    assert(solver in SOLVERS)
+    compiled = anagram_dictionary.load(word_file)
+    if solver == 'best_words_advanced':
+        dictionary = anagram_solver_advanced.WordTable(compiled)
+    else:
+        dictionary = anagram_solver.Dictionary(compiled)
+
+    # The answers are valid only for the same solver and word file.
+    stat = os.stat(word_file)
+    tag = (solver, os.path.abspath(word_file), stat.st_size, stat.st_mtime_ns)
+    cache = ResultCache(capacity)
+    if cache_file is not None:
+        cache.load(cache_file, tag)
+
+    for query in anagram_solver.read_words(dataset_file):
+        key = query_key(solver, query)
+        (answer, found) = cache.get(key)
+        if not found:
+            if solver == 'best_word':
+                answer = anagram_solver.best_word(dictionary, query)
+            elif solver == 'best_words':
+                answer = anagram_solver.best_words(dictionary, query)
+            else:
+                answer = anagram_solver_advanced.best_words_advanced(
+                    dictionary, query)
+            cache.put(key, answer)
+        if solver == 'best_word':
+            if answer is not None:
+                print(answer)
+        else:
+            print(" ".join(answer))
+
+    if cache_file is not None:
+        cache.save(cache_file, tag)
+    return cache
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (4, 5, 6) or sys.argv[1] not in SOLVERS:
+        print("usage: %s solver word_file dataset_file [capacity [cache_file]]"
+              % sys.argv[0])
+        print("solver: %s" % ", ".join(SOLVERS))
+        exit(1)
+    cache = find_memoized(sys.argv[1], sys.argv[2], sys.argv[3],
+                          int(sys.argv[4]) if len(sys.argv) >= 5 else 100000,
+                          sys.argv[5] if len(sys.argv) == 6 else None)
+    print(cache.stats(), file=sys.stderr)
@@ -0,0 +1,67 @@
+import multiprocessing, sys
+import anagram_dictionary
+import anagram_solver
+import anagram_solver_advanced
+
+# Answer the queries of a dataset file with a pool of worker processes.
+#
+# The preprocessed dictionary is never sent to the workers. Each worker loads
+# it once from the compiled file (see anagram_dictionary.py) when it starts,
+# and the tasks only carry the queries and the answers. The answers are
+# written in the order of the queries, so the output is identical to the
+# sequential find_best_word, find_best_words and find_best_words_advanced.
+
+# The solvers that can be run in parallel.
+SOLVERS = ['best_word', 'best_words', 'best_words_advanced']
+
+# The state of a worker process, set by init_worker().
+worker_solver = None
+worker_dictionary = None
+
+
+# Load the dictionary of |word_file| for |solver| in a worker process.
+def init_worker(solver, word_file):
+    global worker_solver, worker_dictionary
+    compiled = anagram_dictionary.load(word_file)
+    worker_solver = solver
+    if solver == 'best_words_advanced':
+        worker_dictionary = anagram_solver_advanced.WordTable(compiled)
+    else:
+        worker_dictionary = anagram_solver.Dictionary(compiled)
+
+
+# Return the output line of |query|, or None if nothing is printed for it.
+def solve(query):
+    if worker_solver == 'best_word':
+        return anagram_solver.best_word(worker_dictionary, query)
+    if worker_solver == 'best_words':
+        return " ".join(anagram_solver.best_words(worker_dictionary, query))
+    return " ".join(anagram_solver_advanced.best_words_advanced(
+        worker_dictionary, query))
+
+
+# Run |solver| on every query in |dataset_file| with |processes| worker
+# processes (the number of CPUs if None) and print the answers in order.
+# |chunksize|: The number of queries sent to a worker at once.
+def find_parallel(solver, word_file, dataset_file, processes=None,
+                  chunksize=16):
+    assert(solver in SOLVERS)
+    # Compile the dictionary here, so that the workers do not race to
+    # compile it.
+    anagram_dictionary.load(word_file)
+    queries = anagram_solver.read_words(dataset_file)
+    with multiprocessing.Pool(processes, initializer=init_worker,
+                              initargs=(solver, word_file)) as pool:
+        for line in pool.imap(solve, queries, chunksize):
+            if line is not None:
+                print(line)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (4, 5) or sys.argv[1] not in SOLVERS:
+        print("usage: %s solver word_file dataset_file [processes]" %
+              sys.argv[0])
+        print("solver: %s" % ", ".join(SOLVERS))
+        exit(1)
+    find_parallel(sys.argv[1], sys.argv[2], sys.argv[3],
+                  int(sys.argv[4]) if len(sys.argv) == 5 else None)
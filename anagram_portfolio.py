@@ -0,0 +1,125 @@
+import multiprocessing, sys
+import anagram_dictionary
+import anagram_solver
+import anagram_solver_advanced
+
+# A portfolio of anagram_solver_advanced searches run at the same time.
+#
+# find_best_words_advanced tries the search thresholds 20, 40 and 60 one after
+# another. The portfolio instead runs several configurations (a word order of
+# anagram_solver_advanced.ORDERS and a schedule of search thresholds) in
+# separate worker processes, and answers each query with the best answers of
+# any of them.
+#
+# The workers share the best score found so far for the current query:
+#
+# - As soon as one worker finds a complete anagram, the others stop.
+# - A worker stops deepening once the shared score reaches 95% of the query
+#   score, even if the score was found by another worker.
+#
+# The workers are started once and kept for all the queries, so every worker
+# loads its WordTable only once.
+
+# The default configurations: (order, thresholds). A portfolio of N workers
+# uses the first N of them.
+CONFIGURATIONS = [
+    ('length_score', anagram_solver_advanced.SEARCH_THRESHOLDS),
+    ('length_rare', anagram_solver_advanced.SEARCH_THRESHOLDS),
+    ('length_score', (60,)),
+    ('length_score', (10, 20, 40, 80)),
+    ('length_rare', (60,)),
+    ('length_rare', (10, 20, 40, 80)),
+]
+
+
+# The main loop of a worker process.
+# |worker|: The index of the worker.
+# |tasks|: The queue of queries for this worker (None to exit).
+# |results|: The queue of (worker, answers, score, optimal) of all workers.
+# |shared|: A multiprocessing.Value of the best score of the current query.
+def run_worker(worker, word_file, order, thresholds, tasks, results, shared):
+    table = anagram_solver_advanced.WordTable(
+        anagram_dictionary.load(word_file), order)
+
+    def on_improve(answers, score):
+        with shared.get_lock():
+            if score > shared.value:
+                shared.value = score
+
+    def shared_score():
+        return shared.value
+
+    for query in iter(tasks.get, None):
+        result = anagram_solver_advanced.search_words_advanced(
+            table, query, on_improve=on_improve, thresholds=thresholds,
+            shared_score=shared_score)
+        results.put((worker, result.answers, result.score, result.optimal))
+
+
+# A set of worker processes that answer queries together.
+class Portfolio:
+    # |configurations|: A list of (order, thresholds), one per worker.
+    def __init__(self, word_file, configurations=CONFIGURATIONS):
+        assert(len(configurations) >= 1)
+        # Compile the dictionary here, so that the workers do not race to
+        # compile it.
+        anagram_dictionary.load(word_file)
+        self.shared = multiprocessing.Value('q', 0)
+        self.results = multiprocessing.Queue()
+        self.tasks = []
+        self.workers = []
+        for worker, (order, thresholds) in enumerate(configurations):
+            tasks = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=run_worker,
+                args=(worker, word_file, order, thresholds, tasks,
+                      self.results, self.shared),
+                daemon=True)
+            process.start()
+            self.tasks.append(tasks)
+            self.workers.append(process)
+        # The number of queries each worker won.
+        self.wins = [0] * len(configurations)
+
+    # Return the best answers for |query| found by any worker.
+    def best_words(self, query):
+        self.shared.value = 0
+        for tasks in self.tasks:
+            tasks.put(query)
+        best = None
+        for _ in self.workers:
+            worker, answers, score, optimal = self.results.get()
+            if best is None or score > best[2]:
+                best = (worker, answers, score)
+        self.wins[best[0]] += 1
+        return best[1]
+
+    def close(self):
+        for tasks in self.tasks:
+            tasks.put(None)
+        for process in self.workers:
+            process.join()
+
+
+# find_best_words_advanced() with a portfolio of |processes| workers (the
+# number of CPUs if None, at most len(CONFIGURATIONS)).
+def find_best_words_portfolio(word_file, dataset_file, processes=None):
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = max(1, min(processes, len(CONFIGURATIONS)))
+    portfolio = Portfolio(word_file, CONFIGURATIONS[:processes])
+    try:
+        for query in anagram_solver.read_words(dataset_file):
+            print(" ".join(portfolio.best_words(query)), flush=True)
+    finally:
+        portfolio.close()
+    for (order, thresholds), wins in zip(CONFIGURATIONS, portfolio.wins):
+        print("%s %s: %d wins" % (order, thresholds, wins), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print("usage: %s word_file dataset_file [processes]" % sys.argv[0])
+        exit(1)
+    find_best_words_portfolio(sys.argv[1], sys.argv[2],
+                              int(sys.argv[3]) if len(sys.argv) == 4 else None)
@@ -1,72 +1,182 @@
-import sys
+import random, sys
+import anagram_dictionary
+from anagram_words import SCORES, get_score, get_vector, read_words
 
 
-# SCORES of the characters:
-# ----------------------------------------
-# | 1 point  | a, e, h, i, n, o, r, s, t |
-# | 2 points | c, d, l, m, u             |
-# | 3 points | b, f, g, p, v, w, y       |
-# | 4 points | j, k, q, x, z             |
-# ----------------------------------------
-SCORES = [1, 3, 2, 2, 1, 3, 3, 1, 1, 4, 4, 2, 2, 1, 1, 3, 4, 1, 1, 1, 2, 3, 3, 4, 3, 4]
+# Return true if 'word_vector' can be constructed as an anagram of
+# 'query_vector'.
+def can_construct(word_vector, query_vector):
+    for i in range(26):
+        if query_vector[i] < word_vector[i]:
+            return False
+    return True
 
 
-# Calculate the score of a given word.
-def get_score(word):
-    score = 0
-    for character in list(word):
-        score += SCORES[ord(character) - ord('a')]
-    return score
+# Sub-multiset index over occurrence vectors.
+#
+# Given a query vector, the index returns the set of words that can be
+# constructed from it without testing the words that cannot. A set of words is
+# a Python int used as a bitset over the word indices, so the set operations
+# run in C over machine words:
+#
+# |self.fits[k][c]|: The set of words that contain the k-th character at most
+#                    c times, for c < |self.max_counts[k]|. Every word contains
+#                    the k-th character at most |self.max_counts[k]| times, so
+#                    larger c need no set.
+# |self.letters[i]|: The characters (0-25) contained in the i-th word.
+class SubmultisetIndex:
+    # |vectors|: The occurrence vectors of the words.
+    # |letters|, |fits|: |self.letters| and |self.fits| of an index previously
+    #                    built from |vectors| (e.g. loaded from a compiled
+    #                    dictionary), or None to build them.
+    def __init__(self, vectors, letters=None, fits=None):
+        self.size = len(vectors)
+        self.all = (1 << self.size) - 1
+        if letters is None:
+            letters = [[k for k, count in enumerate(vector) if count]
+                       for vector in vectors]
+        self.letters = letters
+        if fits is not None:
+            self.fits = fits
+            self.max_counts = [len(fits_k) for fits_k in fits]
+            return
+        self.max_counts = [0] * 26
+        for i in range(self.size):
+            for k in self.letters[i]:
+                if self.max_counts[k] < vectors[i][k]:
+                    self.max_counts[k] = vectors[i][k]
+        # exact[k][c]: The words that contain the k-th character c times
+        # (c >= 1).
+        exact = [[bytearray((self.size + 7) // 8)
+                  for c in range(self.max_counts[k] + 1)] for k in range(26)]
+        for i in range(self.size):
+            for k in self.letters[i]:
+                exact[k][vectors[i][k]][i >> 3] |= 1 << (i & 7)
+        self.fits = []
+        for k in range(26):
+            fits_k = [0] * self.max_counts[k]
+            more = 0
+            for c in range(self.max_counts[k] - 1, -1, -1):
+                more |= int.from_bytes(exact[k][c + 1], 'little')
+                fits_k[c] = self.all ^ more
+            self.fits.append(fits_k)
 
+    # Return the set of words that can be constructed from |vector|.
+    def find(self, vector):
+        bits = self.all
+        for k in range(26):
+            if vector[k] < self.max_counts[k]:
+                bits &= self.fits[k][vector[k]]
+        return bits
 
-# Build the occurrence vector of characters in a given word.
-def get_vector(word):
-    vector = [0] * 26
-    for character in list(word):
-        vector[ord(character) - ord('a')] += 1
-    return vector
+    # Return the subset of |bits| that can be constructed from |vector|, when
+    # all the words in |bits| fit in a vector that differs from |vector| only
+    # in the characters |letters|.
+    def narrow(self, bits, vector, letters):
+        for k in letters:
+            if vector[k] < self.max_counts[k]:
+                bits &= self.fits[k][vector[k]]
+        return bits
 
 
-# Read a given file and return a list of words.
-def read_words(file):
-    words = []
-    with open(file) as file:
-        for line in file:
-            word = line.rstrip('\n')
-            words.append(word)
-    return words
+# Yield the indices in a given bitset in ascending order.
+def iterate_bits(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
 
 
-# Return true if 'word_vector' can be constructed as an anagram of
-# 'query_vector'.
-def can_construct(word_vector, query_vector):
-    for i in range(26):
-        if query_vector[i] < word_vector[i]:
-            return False
-    return True
+# The dictionary preprocessed for Homework #2 and #3, built from a
+# CompiledDictionary (see anagram_dictionary.py) so that the occurrence
+# vectors, the scores and the index are calculated once, or loaded from the
+# compiled file.
+#
+# |self.words_by_score|: The words in the reverse order of scores.
+# |self.vectors_by_score|: The occurrence vectors of |self.words_by_score|.
+# |self.words_by_length|: The words in the reverse order of word lengths.
+# |self.vectors_by_length|: The occurrence vectors of |self.words_by_length|.
+# |self.scores_by_length|: The scores of |self.words_by_length|.
+# |self.positions_by_length|: The positions of |self.words_by_length| in the
+#                             word file.
+# |self.index|: The SubmultisetIndex of |self.vectors_by_length|, shared by
+#               best_word() and best_words().
+# |self.score_sets|: (score, the set of words in |self.index| with the score)
+#                    in the reverse order of scores.
+# |self.unique|: The set of words in |self.index| whose occurrence vector is
+#                not the same as that of an earlier word.
+# |self.same_vectors|: For each word in |self.unique|, the indices of the
+#                      words with the same occurrence vector, in order.
+class Dictionary:
+    # |compiled|: A CompiledDictionary.
+    def __init__(self, compiled):
+        words = compiled.words
+        vectors = compiled.vectors
+        scores = compiled.scores
+
+        order = compiled.order_by_score
+        self.words_by_score = [words[i] for i in order]
+        self.vectors_by_score = [vectors[i] for i in order]
+
+        order = compiled.order_by_length
+        self.words_by_length = [words[i] for i in order]
+        self.vectors_by_length = [vectors[i] for i in order]
+        self.scores_by_length = [scores[i] for i in order]
+        self.positions_by_length = order
+
+        self.index = SubmultisetIndex(self.vectors_by_length,
+                                      compiled.letters, compiled.fits)
+        score_bytes = {}
+        for i in range(len(order)):
+            score = self.scores_by_length[i]
+            if score not in score_bytes:
+                score_bytes[score] = bytearray((len(order) + 7) // 8)
+            score_bytes[score][i >> 3] |= 1 << (i & 7)
+        self.score_sets = sorted(
+            [(score, int.from_bytes(bits, 'little'))
+             for score, bits in score_bytes.items()], reverse=True)
+
+        unique_bytes = bytearray((len(order) + 7) // 8)
+        self.same_vectors = {}
+        first = {}
+        for i in range(len(order)):
+            key = bytes(self.vectors_by_length[i])
+            if key in first:
+                self.same_vectors[first[key]].append(i)
+            else:
+                first[key] = i
+                self.same_vectors[i] = [i]
+                unique_bytes[i >> 3] |= 1 << (i & 7)
+        self.unique = int.from_bytes(unique_bytes, 'little')
 
 
 # Homework #2
 #
 # Find the best score word that can be constructed as an anagram of a given
-# query.
+# query. Return None if no word can be constructed.
 #
 # Example: if a query is "rlsneeesufmrsqyo" => "queensferry"
-def find_best_word(word_file, dataset_file):
-    words = read_words(word_file)
-    # Sort the words in the reverse order of scores.
-    words.sort(key=lambda word: get_score(word), reverse=True)
-    word_vectors = [get_vector(word) for word in words]
+def best_word(dictionary, query):
+    candidates = dictionary.index.find(get_vector(query))
+    if not candidates:
+        return None
+    # The best score word is the first word in the reverse order of scores
+    # (ties are kept in the order of the word file), so find the highest
+    # score that has a candidate and then the earliest of those candidates.
+    for score, bits in dictionary.score_sets:
+        if candidates & bits:
+            best = min(iterate_bits(candidates & bits),
+                       key=lambda i: dictionary.positions_by_length[i])
+            return dictionary.words_by_length[best]
 
+
+def find_best_word(word_file, dataset_file):
+    dictionary = Dictionary(anagram_dictionary.load(word_file))
     queries = read_words(dataset_file)
     for query in queries:
-        query_vector = get_vector(query)
-        for i in range(len(words)):
-            if can_construct(word_vectors[i], query_vector):
-                # Since 'words' is sorted in the reverse order of scores, the
-                # first found word is guaranteed to have the best score.
-                print(words[i])
-                break
+        word = best_word(dictionary, query)
+        if word is not None:
+            print(word)
 
 
 # Homework #3
@@ -75,7 +185,9 @@ def find_best_word(word_file, dataset_file):
 # a given query.
 #
 # Example: if a query is "rlsneeesufmrsqyo" => ["queenly", "ferms", "ross"]
-def find_best_words(word_file, dataset_file):
+#
+# |stats|: If not None, an anagram_stats.SearchStats that counts the search.
+def best_words(dictionary, query, stats=None):
     SEARCH_THRESHOLD = 4
 
     # Recursive search
@@ -83,9 +195,12 @@ def find_best_words(word_file, dataset_file):
     # 'score': The current score
     # 'answers': The set of words that achieve the score
     # 'unused_vector': The occurrence vector of unused characters
-    # 'unused_characters': The number of unused characters
-    def search(index, score, answers, unused_vector, unused_characters):
+    # 'candidates': The set of words that can be constructed from
+    #               'unused_vector'
+    def search(index, score, answers, unused_vector, candidates):
         nonlocal best_score, best_answers
+        if stats is not None:
+            stats.visit(len(answers))
 
         # Update the best score
         if score > best_score:
@@ -94,59 +209,296 @@ def find_best_words(word_file, dataset_file):
             
         count = 0
         # Start a search from 'index', instead of 0, to avoid searching
-        # the same set of words.
+        # the same set of words. The sub-multiset index gives only the words
+        # that can be constructed from 'unused_vector'.
+        for i in iterate_bits(candidates >> index << index):
+            count += 1
+            # Pruning: We search the first SEARCH_THRESHOLD words that
+            # can be constructed from 'unused_vector'
+            if count >= SEARCH_THRESHOLD:
+                if stats is not None:
+                    stats.cutoffs += 1
+                break
+
+            # Remove the used characters from 'unused_vector'
+            new_unused_vector = [
+                unused_vector[k] - word_vectors[i][k] for k in range(26)]
+            # Only the characters of the used word have decreased, so the
+            # new candidates are narrowed down from 'candidates'.
+            new_candidates = dictionary.index.narrow(
+                candidates, new_unused_vector, dictionary.index.letters[i])
+            if stats is not None:
+                stats.can_construct += 1
+            answers.append(words[i])
+
+            # Recursion
+            search(i + 1, score + word_scores[i], answers,
+                   new_unused_vector, new_candidates)
+            answers.pop()
+
+    words = dictionary.words_by_length
+    word_vectors = dictionary.vectors_by_length
+    word_scores = dictionary.scores_by_length
+
+    # Store the best score
+    best_score = 0
+    # Store the set of words that achieve the best score
+    best_answers = []
+
+    # Start a recursive search
+    query_vector = get_vector(query)
+    search(0, 0, [], query_vector, dictionary.index.find(query_vector))
+    return best_answers
+
+
+def find_best_words(word_file, dataset_file):
+    dictionary = Dictionary(anagram_dictionary.load(word_file))
+    queries = read_words(dataset_file)
+    for query in queries:
+        print(" ".join(best_words(dictionary, query)))
+
+
+# Homework #3 (exact)
+#
+# Find the set of best score words without the SEARCH_THRESHOLD pruning of
+# best_words(), so the answer is guaranteed to have the best score. The search
+# is a branch and bound:
+#
+# - Bound: Only the words in 'candidates' from 'index' on can still be
+#   added, so an unused character that none of them contains can never be
+#   used. Even if all the other unused characters were used, the score could
+#   not exceed 'score + usable_score(...)'. A node whose bound does not beat
+#   'best_score' is not searched further.
+# - Words with the same occurrence vector have the same score and lead to
+#   the same subtrees, so only the first of them is searched. It can still be
+#   used as many times as there are such words.
+#
+# Return value: (the set of words, the number of searched nodes)
+def best_words_exact(dictionary, query):
+    # Return the total score of the characters in 'unused_vector' that are
+    # contained in some word in 'candidates'.
+    def usable_score(unused_vector, candidates):
+        usable = 0
+        for k in range(26):
+            if unused_vector[k] and candidates & contains[k]:
+                usable += SCORES[k] * unused_vector[k]
+        return usable
+
+    # Recursive search
+    # 'index': The current index in 'words'
+    # 'score': The current score
+    # 'answers': The set of words that achieve the score
+    # 'unused_vector': The occurrence vector of unused characters
+    # 'candidates': The set of words in 'dictionary.unique' that can be
+    #               constructed from 'unused_vector'
+    def search(index, score, answers, unused_vector, candidates):
+        nonlocal best_score, best_answers, nodes
+        nodes += 1
+
+        # Update the best score
+        if score > best_score:
+            best_score = score
+            best_answers = list(answers)
+
+        candidates = candidates >> index << index
+        if not candidates:
+            return
+        bound = score + usable_score(unused_vector, candidates)
+        for i in iterate_bits(candidates):
+            # Bound: 'best_score' may have been improved by the previous
+            # sibling.
+            if bound <= best_score:
+                return
+
+            # Remove the used characters from 'unused_vector'
+            new_unused_vector = [
+                unused_vector[k] - word_vectors[i][k] for k in range(26)]
+            new_candidates = dictionary.index.narrow(
+                candidates, new_unused_vector, dictionary.index.letters[i])
+            same_vectors = dictionary.same_vectors[i]
+            used = uses.get(i, 0)
+            answers.append(words[same_vectors[used]])
+            uses[i] = used + 1
+
+            # Recursion. Search from 'i' again if another word with the same
+            # occurrence vector is left.
+            search(i if used + 1 < len(same_vectors) else i + 1,
+                   score + word_scores[i], answers, new_unused_vector,
+                   new_candidates)
+            uses[i] = used
+            answers.pop()
+
+    words = dictionary.words_by_length
+    word_vectors = dictionary.vectors_by_length
+    word_scores = dictionary.scores_by_length
+
+    # Store the best score
+    best_score = 0
+    # Store the set of words that achieve the best score
+    best_answers = []
+    # The number of times each word in 'dictionary.unique' is used
+    uses = {}
+    nodes = 0
+    # contains[k]: The set of words that contain the k-th character
+    contains = [dictionary.index.all ^ fits_k[0] if fits_k else 0
+                for fits_k in dictionary.index.fits]
+
+    # Start a recursive search
+    query_vector = get_vector(query)
+    search(0, 0, [], query_vector,
+           dictionary.index.find(query_vector) & dictionary.unique)
+    return (best_answers, nodes)
+
+
+def find_best_words_exact(word_file, dataset_file):
+    dictionary = Dictionary(anagram_dictionary.load(word_file))
+    queries = read_words(dataset_file)
+    for query in queries:
+        print(" ".join(best_words_exact(dictionary, query)[0]))
+
+
+# Compare the scores of best_words() with the best scores found by
+# best_words_exact(), to see how much the SEARCH_THRESHOLD pruning gives up.
+def compare_best_words(word_file, dataset_file):
+    dictionary = Dictionary(anagram_dictionary.load(word_file))
+    queries = read_words(dataset_file)
+    total_score = 0
+    total_exact_score = 0
+    for query in queries:
+        score = sum(get_score(word) for word in best_words(dictionary, query))
+        (answers, nodes) = best_words_exact(dictionary, query)
+        exact_score = sum(get_score(word) for word in answers)
+        print("%s: %d / %d (%d nodes)" % (query, score, exact_score, nodes))
+        total_score += score
+        total_exact_score += exact_score
+    print("total: %d / %d (%.2f%%)" % (
+        total_score, total_exact_score,
+        100 * total_score / total_exact_score if total_exact_score else 100))
+
+
+# The can_construct() scans that the index replaced, kept to test the index.
+# Return the best score word of |query| in |words|, or None.
+def best_word_scan(words, query):
+    words = sorted(words, key=lambda word: get_score(word), reverse=True)
+    query_vector = get_vector(query)
+    for word in words:
+        if can_construct(get_vector(word), query_vector):
+            return word
+    return None
+
+
+# Return the answer of best_words() for |query| in |words| by scanning all
+# the words in every node.
+def best_words_scan(words, query):
+    SEARCH_THRESHOLD = 4
+
+    def search(index, score, answers, unused_vector):
+        nonlocal best_score, best_answers
+        if score > best_score:
+            best_score = score
+            best_answers = list(answers)
+        count = 0
         for i in range(index, len(words)):
-            # Skip words longer than 'unused_characters'. This optimization
-            # works because we sorted words by word lengths (instead of
-            # word scores).
-            if unused_characters < len(words[i]):
-                continue
-            
-            # If we find a word that can be constructed from 'unused_vector'
             if can_construct(word_vectors[i], unused_vector):
                 count += 1
-                # Pruning: We search the first SEARCH_THRESHOLD words that
-                # can be constructed from 'unused_vector'
                 if count >= SEARCH_THRESHOLD:
                     break
-
-                # Remove the used characters from 'unused_vector'
                 new_unused_vector = [
                     unused_vector[k] - word_vectors[i][k] for k in range(26)]
                 answers.append(words[i])
-                
-                # Recursion
-                search(i + 1, score + word_scores[i], answers,
-                       new_unused_vector, unused_characters - len(words[i]))
+                search(i + 1, score + get_score(words[i]), answers,
+                       new_unused_vector)
                 answers.pop()
 
-                
-    words = read_words(word_file)
-    # Sort the words in the reverse order of word lengths.
-    # For Homework #3, this is more effective than sorting by word scores
-    # because the search space narrows down faster by selecting longer words.
-    words.sort(key=lambda word: len(word), reverse=True)
-    
-    # Pre-calculate the occurrence vectors for all words
+    words = sorted(words, key=lambda word: len(word), reverse=True)
     word_vectors = [get_vector(word) for word in words]
-    # Pre-calculate the scores for all words
-    word_scores = [get_score(word) for word in words]
+    best_score = 0
+    best_answers = []
+    search(0, 0, [], get_vector(query))
+    return best_answers
 
-    queries = read_words(dataset_file)
-    for query in queries:
-        # Store the best score
-        best_score = 0
-        # Store the set of words that achieve the best score
-        best_answers = []
 
-        # Start a recursive search
-        search(0, 0, [], get_vector(query), len(query))
-        print(" ".join(best_answers))
+# Return the best score of a set of words in |words| (each used at most once)
+# that can be constructed from |query|, by trying every subset.
+def best_score_brute_force(words, query):
+    def search(index, score, unused_vector):
+        if index == len(words):
+            return score
+        best = search(index + 1, score, unused_vector)
+        word_vector = get_vector(words[index])
+        if can_construct(word_vector, unused_vector):
+            best = max(best, search(
+                index + 1, score + get_score(words[index]),
+                [unused_vector[k] - word_vector[k] for k in range(26)]))
+        return best
+
+    return search(0, 0, get_vector(query))
+
+
+# Return a random word of |min_length| to |max_length| characters, mostly of
+# a few common characters so that many words fit in the same query.
+def random_word(min_length, max_length):
+    characters = 'aaabcdeeehrstxz'
+    return ''.join(random.choice(characters)
+                   for i in range(random.randint(min_length, max_length)))
+
+
+# Run tests.
+def run_tests():
+    for iteration in range(300):
+        # Duplicate words and words with the same occurrence vector are
+        # included on purpose.
+        words = [random_word(1, 6) for i in range(random.randint(0, 30))]
+        dictionary = Dictionary(anagram_dictionary.build(words))
+        for trial in range(10):
+            query = random_word(0, 12)
+            answer = best_word(dictionary, query)
+            answer_scan = best_word_scan(words, query)
+            if answer != answer_scan:
+                print(words, query)
+                print("The scan answered %s but best_word answered %s" %
+                      (answer_scan, answer))
+                exit(0)
+            answers = best_words(dictionary, query)
+            answers_scan = best_words_scan(words, query)
+            if answers != answers_scan:
+                print(words, query)
+                print("The scan answered %s but best_words answered %s" %
+                      (answers_scan, answers))
+                exit(0)
+
+    for iteration in range(300):
+        words = [random_word(1, 5) for i in range(random.randint(0, 12))]
+        dictionary = Dictionary(anagram_dictionary.build(words))
+        for trial in range(5):
+            query = random_word(0, 10)
+            answers, nodes = best_words_exact(dictionary, query)
+            score = sum(get_score(word) for word in answers)
+            score_brute_force = best_score_brute_force(words, query)
+            # The answers must be distinct words of the dictionary that fit
+            # in the query together.
+            remaining = list(words)
+            for word in answers:
+                assert(word in remaining)
+                remaining.remove(word)
+            assert(can_construct(get_vector("".join(answers)),
+                                 get_vector(query)))
+            if score != score_brute_force:
+                print(words, query)
+                print("The best score is %d but best_words_exact scored %d"
+                      % (score_brute_force, score))
+                exit(0)
+    print("All tests pass!")
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("usage: %s word_file dataset_file" % sys.argv[0])
+    if len(sys.argv) == 3:
+        find_best_word(sys.argv[1], sys.argv[2])
+        # find_best_words(sys.argv[1], sys.argv[2])
+        # find_best_words_exact(sys.argv[1], sys.argv[2])
+        # compare_best_words(sys.argv[1], sys.argv[2])
+    elif len(sys.argv) == 1:
+        run_tests()
+    else:
+        print("usage: %s [word_file dataset_file]" % sys.argv[0])
         exit(1)
-    find_best_word(sys.argv[1], sys.argv[2])
-    # find_best_words(sys.argv[1], sys.argv[2])
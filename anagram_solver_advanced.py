@@ -1,173 +1,553 @@
-import sys
+import collections, random, sys, time
+import numpy as np
+import anagram_dictionary
+from anagram_words import (BITS_PER_CHAR, SCORES, get_bitmask, get_score,
+                           get_vector, read_words)
 
 
-# SCORES of the characters:
-# ----------------------------------------
-# | 1 point  | a, e, h, i, n, o, r, s, t |
-# | 2 points | c, d, l, m, u             |
-# | 3 points | b, f, g, p, v, w, y       |
-# | 4 points | j, k, q, x, z             |
-# ----------------------------------------
-SCORES = [1, 3, 2, 2, 1, 3, 3, 1, 1, 4, 4, 2, 2, 1, 1, 3, 4, 1, 1, 1, 2, 3, 3, 4, 3, 4]
+# SWAR (SIMD Within A Register)
+SIGN_MASK = sum(1 << (i * BITS_PER_CHAR + 5) for i in range(26))
 
 
-# Calculate the score of a given word.
-def get_score(word):
-    score = 0
-    for character in list(word):
-        score += SCORES[ord(character) - ord('a')]
-    return score
+# Return true if the word can be constructed from the query.
+def can_construct_bitmask(word_bitmask, query_bitmask):
+    return ((query_bitmask - word_bitmask) & SIGN_MASK) == 0
 
 
-# Build the occurrence vector of characters in a given word.
-def get_vector(word):
-    vector = [0] * 26
-    for character in list(word):
-        vector[ord(character) - ord('a')] += 1
-    return vector
+# Packed bitmasks for NumPy. A bitmask is 26 x BITS_PER_CHAR = 182 bits,
+# wider than any machine word, so it is split into LANES uint64 lanes of
+# CHARS_PER_LANE characters each. No character straddles two lanes, so a word
+# can be constructed from a query if the bitmask test holds in every lane.
+# This gives the same answer as can_construct_bitmask() as long as every
+# occurrence count of the query is less than 32 (the sign bit of a character).
+CHARS_PER_LANE = 9
+LANES = 3
+LANE_BITS = CHARS_PER_LANE * BITS_PER_CHAR
+LANE_MASK = (1 << LANE_BITS) - 1
+SIGN_LANES = [np.uint64((SIGN_MASK >> (j * LANE_BITS)) & LANE_MASK)
+              for j in range(LANES)]
 
+# The search tests the children of a node with NumPy only when at least
+# VECTORIZE_MIN words are left to test, because the call overhead of NumPy
+# is larger than a short loop.
+VECTORIZE_MIN = 32
 
-# Read a given file and return a list of words.
-def read_words(file):
-    words = []
-    with open(file) as file:
-        for line in file:
-            word = line.rstrip('\n')
-            words.append(word)
-    return words
 
+# Split a bitmask into LANES lanes.
+def get_lanes(bitmask):
+    return [np.uint64((bitmask >> (j * LANE_BITS)) & LANE_MASK)
+            for j in range(LANES)]
 
-# SWAR (SIMD Within A Register)
-BITS_PER_CHAR = 7
-SIGN_MASK = sum(1 << (i * BITS_PER_CHAR + 5) for i in range(26))
 
-# Calculate a bitmask for a given word.
-def get_bitmask(word):
-    bitmask = 0
-    vector = [0] * 26
-    for character in word:
-        index = ord(character) - ord('a')
-        shift = index * BITS_PER_CHAR
-        bitmask += (1 << shift)
-        vector[index] += 1
-        assert(vector[index] < (1 << (BITS_PER_CHAR - 1)))
-    return bitmask
+# Return the first |limit| positions from |begin| in |lanes| (the packed
+# bitmasks of a list of words) of the words that can be constructed from
+# |unused_bitmask|.
+def fitting_children(lanes, begin, unused_bitmask, limit):
+    unused_lanes = get_lanes(unused_bitmask)
+    misfit = (unused_lanes[0] - lanes[0][begin:]) & SIGN_LANES[0]
+    for j in range(1, LANES):
+        misfit |= (unused_lanes[j] - lanes[j][begin:]) & SIGN_LANES[j]
+    positions = np.flatnonzero(misfit == 0)[:limit]
+    return (positions + begin).tolist()
 
 
-# Return true if the word can be constructed from the query.
-def can_construct_bitmask(word_bitmask, query_bitmask):
-    return ((query_bitmask - word_bitmask) & SIGN_MASK) == 0
+# The memo of search_words_advanced().
+#
+# For each bitmask of unused characters, the memo stores (index, score, exact,
+# round) of the best search node seen with the bitmask: a node with the same
+# bitmask, a lower or equal score and a higher or equal index cannot find
+# anything better and is pruned. |exact| is True if the subtree of the node
+# was searched without any 'search_threshold' pruning, and |round| is the
+# iterative-deepening round that stored the entry.
+#
+# A new round uses a larger 'search_threshold', so an entry whose subtree was
+# pruned by a smaller threshold no longer proves anything and is dropped by
+# start_round(). Exact entries stay valid and are reused.
+#
+# |capacity|: The maximum number of entries (not bytes), or None for no
+#             limit. When the memo is full, the least recently used entry is
+#             evicted. The memory per entry depends on the Python build and
+#             on the size of the bitmask keys, so measure it (e.g. with
+#             tracemalloc) before choosing a capacity for a memory budget.
+# |self.hits|: The number of nodes pruned by the memo.
+# |self.reuses|: The number of hits on an entry of a previous round.
+# |self.misses|: The number of nodes not pruned by the memo.
+# |self.evictions|: The number of evicted entries.
+class MemoTable:
+    def __init__(self, capacity=None):
+        assert(capacity is None or capacity >= 1)
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+        self.round = 0
+        self.hits = 0
+        self.reuses = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Return the entry of |bitmask|, or None.
+    def get(self, bitmask):
+        entry = self.entries.get(bitmask)
+        if entry is not None and self.capacity is not None:
+            self.entries.move_to_end(bitmask)
+        return entry
+
+    def put(self, bitmask, entry):
+        self.entries[bitmask] = entry
+        if self.capacity is not None:
+            self.entries.move_to_end(bitmask)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    # Start a new iterative-deepening round.
+    def start_round(self):
+        self.round += 1
+        self.entries = collections.OrderedDict(
+            (bitmask, entry) for bitmask, entry in self.entries.items()
+            if entry[2])
+
+    def stats(self):
+        return "memo: %d hits (%d reused), %d misses, %d evictions, " \
+            "%d entries" % (self.hits, self.reuses, self.misses,
+                            self.evictions, len(self.entries))
+
+
+# Raised in the search when the time or node budget of a query runs out.
+class SearchBudgetExceeded(Exception):
+    pass
+
+
+# The result of search_words_advanced().
+#
+# |self.answers|: The best set of words found.
+# |self.score|: The score of |self.answers|.
+# |self.optimal|: True if |self.answers| is proven to have the best score,
+#                 i.e. it uses all the characters of the query, or a search
+#                 round finished without any 'search_threshold' pruning.
+# |self.exhausted|: True if the search stopped because the budget ran out.
+# |self.nodes|: The number of searched nodes.
+# |self.memo|: The MemoTable.
+class SearchResult:
+    def __init__(self, answers, score, optimal, exhausted, nodes, memo):
+        self.answers = answers
+        self.score = score
+        self.optimal = optimal
+        self.exhausted = exhausted
+        self.nodes = nodes
+        self.memo = memo
+
+
+# The orders of the words in a WordTable. The words are always sorted in the
+# reverse order of word lengths, which the search relies on; the orders only
+# differ for words of the same length:
+#
+#   length_score: Higher scores first.
+#   length_rare:  Words with the characters that are rarer in the dictionary
+#                 first, because they are the hardest to use up later.
+ORDERS = ['length_score', 'length_rare']
+
+
+# The words of a CompiledDictionary, preprocessed once for all queries as a
+# struct of arrays. The words are sorted in the reverse order of word lengths
+# (and in |order| for the same length).
+# For Homework #3, this is more effective than sorting by word scores
+# because the search space narrows down faster by selecting longer words.
+#
+# |self.words|: The words.
+# |self.bitmasks|: The bitmasks of |self.words|.
+# |self.scores|: The scores of |self.words|.
+# |self.lengths|: The lengths of |self.words|.
+# |self.length_array|: |self.lengths| as a NumPy array.
+# |self.vectors|: The N x 26 uint8 occurrence matrix of |self.words|, stored
+#                 in column-major order so that the counts of one character
+#                 are contiguous.
+# |self.lanes|: The LANES x N uint64 packed bitmasks of |self.words|.
+class WordTable:
+    # |compiled|: A CompiledDictionary.
+    # |order|: One of ORDERS.
+    def __init__(self, compiled, order='length_score'):
+        assert(order in ORDERS)
+        if order == 'length_score':
+            order = compiled.order_by_length_score
+        else:
+            order = rare_order(compiled)
+        self.words = [compiled.words[i] for i in order]
+        self.bitmasks = [compiled.bitmasks[i] for i in order]
+        self.scores = [compiled.scores[i] for i in order]
+        self.lengths = [compiled.lengths[i] for i in order]
+        self.length_array = np.array(self.lengths, dtype=np.int64)
+        data = b''.join(bytes(compiled.vectors[i]) for i in order)
+        self.vectors = np.asfortranarray(
+            np.frombuffer(data, dtype=np.uint8).reshape(len(order), 26))
+        self.max_counts = self.vectors.max(axis=0, initial=0)
+        self.lanes = np.zeros((LANES, len(order)), dtype=np.uint64)
+        for k in range(26):
+            j = k // CHARS_PER_LANE
+            shift = (k % CHARS_PER_LANE) * BITS_PER_CHAR
+            self.lanes[j] += self.vectors[:, k].astype(np.uint64) << \
+                np.uint64(shift)
+
+    # Return the list of the indices of the words that can be constructed
+    # from |query|, in ascending order. The words are tested with one
+    # vectorized comparison per character instead of one bitmask at a time.
+    def valid_indices(self, query):
+        query_vector = np.array(get_vector(query), dtype=np.int64)
+        valid = np.ones(len(self.words), dtype=bool)
+        for k in np.nonzero(query_vector < self.max_counts)[0]:
+            valid &= self.vectors[:, k] <= query_vector[k]
+        return np.nonzero(valid)[0].tolist()
+
+    # Return the offset table of |valid| (a list of word indices in ascending
+    # order) by length: the L-th element is the position of the first word
+    # in |valid| whose length is at most L, for L = 0, ..., |max_length|.
+    # This works because the words are sorted by length.
+    def length_offsets(self, valid, max_length):
+        lengths = self.length_array[np.array(valid, dtype=np.int64)]
+        return np.searchsorted(-lengths, -np.arange(max_length + 1),
+                               side='left').tolist()
+
+
+# Return the word positions of |compiled| in the 'length_rare' order.
+def rare_order(compiled):
+    data = b''.join(bytes(vector) for vector in compiled.vectors)
+    vectors = np.frombuffer(data, dtype=np.uint8).reshape(
+        len(compiled.words), 26).astype(np.float64)
+    # The rarity of a character is the inverse of its total count.
+    rarity = 1 / np.maximum(vectors.sum(axis=0), 1)
+    lengths = np.array(compiled.lengths, dtype=np.int64)
+    # np.lexsort sorts by the last key first.
+    return np.lexsort((-(vectors @ rarity), -lengths)).tolist()
+
+
+# The 'search_threshold' of each iterative-deepening round of
+# search_words_advanced().
+SEARCH_THRESHOLDS = (20, 40, 60)
 
 
 # Homework #3 (advanced)
-def find_best_words_advanced(word_file, dataset_file):
+#
+# Find the set of best score words that can be constructed as an anagram of
+# a given query, using the words in a WordTable.
+#
+# The search is anytime: it can be given a budget, and returns the best
+# answers found so far when the budget runs out.
+# |time_limit|: If not None, the search stops after |time_limit| seconds.
+# |node_limit|: If not None, the search stops after |node_limit| nodes.
+# |on_improve|: If not None, called with (answers, score) every time the
+#               best score improves.
+# |memo_capacity|: The capacity of the MemoTable (None for no limit).
+# |vectorized|: If True, the children of a node are tested with the packed
+#               bitmasks in one NumPy operation instead of one by one.
+# |stats|: If not None, an anagram_stats.SearchStats that counts the search.
+# |thresholds|: The 'search_threshold' of each iterative-deepening round.
+# |shared_score|: If not None, a function that returns the best score found
+#                 by other searches of the same query (anagram_portfolio.py).
+#                 The search stops as if the budget ran out when it is a
+#                 complete anagram, and the 95% check uses it as well.
+# Return value: A SearchResult.
+def search_words_advanced(table, query, time_limit=None, node_limit=None,
+                          on_improve=None, memo_capacity=None,
+                          vectorized=True, stats=None,
+                          thresholds=SEARCH_THRESHOLDS, shared_score=None):
     # Recursive search
-    # 'index': The current index in 'words'
+    # 'index': The current index in 'valid_words'
     # 'score': The current score
     # 'answers': The set of words that achieve the score
     # 'unused_bitmask': The bitmask of unused characters
     # 'unused_characters': The number of unused characters
+    # Return value: True if the subtree was searched without any
+    #               'search_threshold' pruning.
     def search(index, score, answers, unused_bitmask, unused_characters):
-        nonlocal best_score, best_answers, memo, search_threshold
+        nonlocal best_score, best_answers, cutoff, nodes
+
+        # Check the budget. The clock and 'shared_score' are read only every 16
+        # nodes.
+        nodes += 1
+        if node_limit is not None and nodes > node_limit:
+            raise SearchBudgetExceeded()
+        if (nodes & 15) == 0:
+            if deadline is not None and time.perf_counter() > deadline:
+                raise SearchBudgetExceeded()
+            if shared_score is not None and shared_score() >= query_score:
+                raise SearchBudgetExceeded()
+        if stats is not None:
+            stats.visit(len(answers))
 
         # Update the best score
         if score > best_score:
             best_score = score
             best_answers = list(answers)
+            if on_improve is not None:
+                on_improve(best_answers, best_score)
+            if stats is not None and best_score == query_score:
+                stats.early_exits += 1
             
         # Finish searching when we found a complete anagram
         if best_score == query_score:
-            return
+            return False
 
         # Memorization
-        memo_index, memo_score = memo.get(
-            unused_bitmask, (len(valid_words), -1))
+        entry = memo.get(unused_bitmask)
+        if entry is None:
+            entry = (len(valid_words), -1, False, memo.round)
+        memo_index, memo_score, memo_exact, memo_round = entry
         if score <= memo_score and index >= memo_index:
-            return
-        if score > memo_score or (
-                score == memo_score and index < memo_index):
-            memo[unused_bitmask] = (index, score)
-        
-        count = 0
+            memo.hits += 1
+            if memo_round != memo.round:
+                memo.reuses += 1
+            if stats is not None:
+                stats.memo_prunes += 1
+            return memo_exact
+        memo.misses += 1
+        stored = score > memo_score or (
+            score == memo_score and index < memo_index)
+        if stored:
+            memo.put(unused_bitmask, (index, score, False, memo.round))
+
+        exact = True
         # Start a search from 'index', instead of 0, to avoid searching
-        # the same set of words.
-        for i in range(index, len(valid_words)):
+        # the same set of words. Skip words longer than 'unused_characters'
+        # by jumping to the first word that is not longer. This optimization
+        # works because we sorted words by word lengths (instead of word
+        # scores).
+        begin = max(index, length_offsets[unused_characters])
+        # Find the first 'search_threshold' words that can be constructed
+        # from 'unused_bitmask'.
+        if lanes is not None and len(valid_words) - begin >= VECTORIZE_MIN:
+            children = fitting_children(lanes, begin, unused_bitmask,
+                                        search_threshold)
+            if stats is not None:
+                stats.can_construct += len(valid_words) - begin
+        else:
+            children = []
+            for i in range(begin, len(valid_words)):
+                if can_construct_bitmask(bitmasks[valid_words[i]],
+                                         unused_bitmask):
+                    children.append(i)
+                    if len(children) >= search_threshold:
+                        break
+            if stats is not None:
+                if len(children) >= search_threshold:
+                    stats.can_construct += children[-1] + 1 - begin
+                else:
+                    stats.can_construct += len(valid_words) - begin
+        # Pruning: We search the first 'search_threshold' - 1 words that
+        # can be constructed from 'unused_bitmask'
+        if len(children) >= search_threshold:
+            if stats is not None:
+                stats.cutoffs += 1
+            cutoff = True
+            exact = False
+            children = children[:search_threshold - 1]
+
+        for i in children:
             word = valid_words[i]
-            
-            # Skip words longer than 'unused_characters'. This optimization
-            # works because we sorted words by word lengths (instead of
-            # word scores).
-            if unused_characters < word['length']:
-                continue
-            
-            # If we find a word that can be constructed from 'unused_bitmask'
-            if can_construct_bitmask(word['bitmask'], unused_bitmask):
-                count += 1
-                # Pruning: We search the first 'search_threshold' words that
-                # can be constructed from 'unused_bitmask'
-                if count >= search_threshold:
-                    break
-
-                # Remove the used characters from 'unused_bitmask'
-                new_unused_bitmask = unused_bitmask - word['bitmask']
-                answers.append(word['word'])
-                
-                # Recursion
-                search(i + 1, score + word['score'], answers,
-                       new_unused_bitmask, unused_characters - word['length'])
-                answers.pop()
-
-
-    words = read_words(word_file)
-    # Sort the words in the reverse order of word lengths.
-    # For Homework #3, this is more effective than sorting by word scores
-    # because the search space narrows down faster by selecting longer words.
-    words.sort(key=lambda word: (len(word), get_score(word)), reverse=True)
 
+            # Remove the used characters from 'unused_bitmask'
+            new_unused_bitmask = unused_bitmask - bitmasks[word]
+            answers.append(words[word])
+
+            # Recursion
+            if not search(i + 1, score + scores[word], answers,
+                          new_unused_bitmask,
+                          unused_characters - lengths[word]):
+                exact = False
+            answers.pop()
+
+            # Finish searching when we found a complete anagram
+            if best_score == query_score:
+                return False
+
+        # Mark the entry as exact if it is still the entry of this node.
+        if exact and stored:
+            entry = memo.get(unused_bitmask)
+            if entry is not None and entry[:2] == (index, score):
+                memo.put(unused_bitmask, (index, score, True, memo.round))
+        return exact
+
+    deadline = None
+    if time_limit is not None:
+        deadline = time.perf_counter() + time_limit
+    nodes = 0
+
+    query_score = get_score(query)
+    query_bitmask = get_bitmask(query)
+
+    # Store the best score
+    best_score = 0
+    # Store the set of words that achieve the best score
+    best_answers = []
+
+    # Pre-calculate a list of the indices of the words that can be
+    # constructed from the query. This allows us to skip searching words
+    # that cannot be constructed from the query.
+    words = table.words
+    bitmasks = table.bitmasks
+    scores = table.scores
+    lengths = table.lengths
+    valid_words = table.valid_indices(query)
+    length_offsets = table.length_offsets(valid_words, len(query))
+    lanes = None
+    if vectorized and max(get_vector(query), default=0) < 32:
+        lanes = table.lanes[:, valid_words]
+
+    # Iterative search
+    optimal = False
+    exhausted = False
+    memo = MemoTable(memo_capacity)
+    for search_threshold in thresholds:
+        # Memorization
+        memo.start_round()
+        # Set to True when 'search_threshold' prunes any word.
+        cutoff = False
+
+        # Start a recursive search
+        try:
+            search(0, 0, [], query_bitmask, len(query))
+        except SearchBudgetExceeded:
+            exhausted = True
+            break
+
+        # Without any pruning by 'search_threshold', the search was
+        # exhaustive and a larger threshold would find nothing better.
+        if not cutoff:
+            optimal = True
+            break
+
+        score = 0
+        for answer in best_answers:
+            score += get_score(answer)
+        if shared_score is not None:
+            score = max(score, shared_score())
+        if score / query_score > 0.95:
+            break
+    # print(score / query_score)
+    if best_score == query_score:
+        optimal = True
+    return SearchResult(best_answers, best_score, optimal, exhausted, nodes,
+                        memo)
+
+
+# Find the set of best score words that can be constructed as an anagram of
+# a given query, using the words in a WordTable.
+# |stats|: If not None, an anagram_stats.SearchStats that counts the search.
+def best_words_advanced(table, query, stats=None):
+    return search_words_advanced(table, query, stats=stats).answers
+
+
+def find_best_words_advanced(word_file, dataset_file):
+    table = WordTable(anagram_dictionary.load(word_file))
     queries = read_words(dataset_file)
     for query in queries:
-        query_score = get_score(query)
-        query_bitmask = get_bitmask(query)
-        
-        # Store the best score
-        best_score = 0
-        # Store the set of words that achieve the best score
-        best_answers = []
-
-        # Pre-calculate a list of words that can be constructed from the query.
-        # This allows us to skip searching words that cannot be constructed
-        # from the query.
-        valid_words = []
-        for word in words:
-            word_bitmask = get_bitmask(word)
-            if can_construct_bitmask(word_bitmask, query_bitmask):
-                valid_words.append({
-                    'word': word,
-                    'bitmask': word_bitmask,
-                    'score': get_score(word),
-                    'length': len(word)
-                })
-
-        # Iterative search
-        for iteration in range(1, 4):
-            # Memorization
-            memo = {}
-            
-            # Start a recursive search
-            search_threshold = iteration * 20
-            search(0, 0, [], get_bitmask(query), len(query))
-
-            score = 0
-            for answer in best_answers:
-                score += get_score(answer)
-            if score / query_score > 0.95:
-                break
-        # print(score / query_score)
-        print(" ".join(best_answers))
+        print(" ".join(best_words_advanced(table, query)))
+
+
+# find_best_words_advanced() with a per-query budget. Improvements are
+# streamed to stderr as "<query>: <score> <words>" while the search runs,
+# followed by the status of the query ("optimal", "budget" if the budget ran
+# out, or "heuristic"). The final answers are printed to stdout.
+# |time_limit|, |node_limit|: The budget of each query (None for no limit).
+# |memo_capacity|: The capacity of the MemoTable of each query, in entries
+#                  (None for no limit).
+def find_best_words_anytime(word_file, dataset_file, time_limit=None,
+                            node_limit=None, memo_capacity=None):
+    table = WordTable(anagram_dictionary.load(word_file))
+    queries = read_words(dataset_file)
+    for query in queries:
+        def on_improve(answers, score):
+            print("%s: %d %s" % (query, score, " ".join(answers)),
+                  file=sys.stderr, flush=True)
+        result = search_words_advanced(table, query, time_limit, node_limit,
+                                       on_improve, memo_capacity)
+        if result.optimal:
+            status = "optimal"
+        elif result.exhausted:
+            status = "budget"
+        else:
+            status = "heuristic"
+        print("%s: %s (%d nodes, %s)" % (
+            query, status, result.nodes, result.memo.stats()),
+              file=sys.stderr, flush=True)
+        print(" ".join(result.answers), flush=True)
     
 
+# Return a random word of |min_length| to |max_length| characters, mostly of
+# a few common characters so that many words fit in the same query.
+def random_word(min_length, max_length):
+    characters = 'aaabcdeeehrstxz'
+    return ''.join(random.choice(characters)
+                   for i in range(random.randint(min_length, max_length)))
+
+
+# For a given WordTable and query, check that the vectorized search tests the
+# same children as the one-by-one search, i.e. that it gives the same answers
+# after the same number of nodes.
+def check_vectorized(table, query):
+    result = search_words_advanced(table, query, vectorized=True)
+    result_scalar = search_words_advanced(table, query, vectorized=False)
+    if (result.answers != result_scalar.answers or
+            result.nodes != result_scalar.nodes):
+        print(table.words, query)
+        print("The scalar search answered %s (%d nodes) but the vectorized "
+              "search answered %s (%d nodes)" % (
+                  result_scalar.answers, result_scalar.nodes,
+                  result.answers, result.nodes))
+        exit(0)
+
+
+# For a given WordTable and query, check that valid_indices() returns the
+# words whose occurrence vectors fit in the query.
+def check_valid_indices(table, query):
+    query_vector = get_vector(query)
+    expected = [i for i, word in enumerate(table.words)
+                if all(count <= query_vector[k]
+                       for k, count in enumerate(get_vector(word)))]
+    if table.valid_indices(query) != expected:
+        print(table.words, query)
+        print("valid_indices() is wrong")
+        exit(0)
+
+
+# Run tests.
+def run_tests():
+    # The SWAR bitmask test of the baseline rejected some words for a query
+    # with a character 32 or more times, so this query found only 'a' * 36.
+    words = ['a' * 36, 'aeb', 'caa', 'da', 'bb']
+    table = WordTable(anagram_dictionary.build(words))
+    query = 'a' * 40 + 'bcde'
+    check_valid_indices(table, query)
+    assert(sorted(best_words_advanced(table, query)) ==
+           sorted(['a' * 36, 'aeb', 'caa', 'da']))
+
+    # A small VECTORIZE_MIN makes the small tables use the packed bitmasks.
+    global VECTORIZE_MIN
+    saved_vectorize_min = VECTORIZE_MIN
+    for VECTORIZE_MIN in (saved_vectorize_min, 1):
+        for iteration in range(100):
+            words = [random_word(1, 6) for i in range(random.randint(0, 80))]
+            table = WordTable(anagram_dictionary.build(words))
+            for trial in range(5):
+                query = random_word(0, 14)
+                check_vectorized(table, query)
+                check_valid_indices(table, query)
+                check_valid_indices(table, query + 'a' * 40)
+    VECTORIZE_MIN = saved_vectorize_min
+    print("All tests pass!")
+
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("usage: %s word_file dataset_file" % sys.argv[0])
+    if len(sys.argv) in (4, 5):
+        # A time limit of 0 means no limit, so that only the memo capacity
+        # can be given.
+        time_limit = float(sys.argv[3])
+        find_best_words_anytime(
+            sys.argv[1], sys.argv[2], time_limit=time_limit or None,
+            memo_capacity=int(sys.argv[4]) if len(sys.argv) == 5 else None)
+    elif len(sys.argv) == 3:
+        find_best_words_advanced(sys.argv[1], sys.argv[2])
+    elif len(sys.argv) == 1:
+        run_tests()
+    else:
+        print("usage: %s [word_file dataset_file [time_limit "
+              "[memo_capacity]]]" % sys.argv[0])
         exit(1)
-    find_best_words_advanced(sys.argv[1], sys.argv[2])
@@ -0,0 +1,141 @@
+import sys, time
+import numpy as np
+import anagram_dictionary
+from anagram_solver import Dictionary, best_word, get_vector, read_words
+
+# Homework #2 with NumPy.
+#
+# The occurrence vectors of the dictionary are stored as one N x 26 uint8
+# matrix in the reverse order of scores (the same order as
+# Dictionary.words_by_score). A word can be constructed from a query if none
+# of its 26 counts exceeds the query's, so a query is answered by comparing
+# the query against the whole matrix, and the first word that fits is the
+# best score word.
+#
+# The matrix is stored in column-major order, so that the counts of one
+# character are contiguous. The comparison is done one character at a time,
+# which is an order of magnitude faster than reducing a row-major N x 26
+# comparison over axis 1, and characters whose query count is at least the
+# largest count in the dictionary are skipped.
+
+# The number of bytes of the boolean Q x N array compared at once in
+# best_word_batch().
+BATCH_BYTES = 64 * 1024 * 1024
+
+
+# Build the N x 26 occurrence matrix of |dictionary|.
+def build_matrix(dictionary):
+    for vector in dictionary.vectors_by_score:
+        assert(max(vector) < 256)
+    data = b''.join(bytes(vector) for vector in dictionary.vectors_by_score)
+    matrix = np.frombuffer(data, dtype=np.uint8)
+    matrix = matrix.reshape(len(dictionary.words_by_score), 26)
+    return np.asfortranarray(matrix)
+
+
+# Return the N booleans that tell whether each word fits in |query_vector|.
+def fits_query(matrix, column_max, query_vector):
+    fits = np.ones(matrix.shape[0], dtype=bool)
+    for k in np.nonzero(query_vector < column_max)[0]:
+        fits &= matrix[:, k] <= query_vector[k]
+    return fits
+
+
+# Build the Q x 26 occurrence matrix of |queries|. Counts larger than 255 are
+# clipped, which does not change the answers because no word has more than
+# 255 occurrences of a character.
+def build_query_matrix(queries):
+    matrix = np.array([get_vector(query) for query in queries],
+                      dtype=np.int64).reshape(len(queries), 26)
+    return np.minimum(matrix, 255).astype(np.uint8)
+
+
+# Return the best score word that can be constructed from |query|, or None.
+# |column_max|: matrix.max(axis=0, initial=0), calculated once for all the
+#               queries.
+def best_word_numpy(dictionary, matrix, column_max, query):
+    query_vector = build_query_matrix([query])[0]
+    fits = fits_query(matrix, column_max, query_vector)
+    i = int(fits.argmax()) if len(fits) else 0
+    if len(fits) and fits[i]:
+        return dictionary.words_by_score[i]
+    return None
+
+
+# Return the best score word (or None) of every query in |queries|. The
+# queries are compared against the matrix as Q x N broadcasts, one character
+# at a time, in chunks of at most BATCH_BYTES.
+def best_word_batch(dictionary, matrix, queries):
+    query_matrix = build_query_matrix(queries)
+    column_max = matrix.max(axis=0, initial=0)
+    chunk = max(1, BATCH_BYTES // max(1, matrix.shape[0]))
+    answers = []
+    for begin in range(0, len(queries), chunk):
+        block = query_matrix[begin:begin + chunk]
+        if matrix.shape[0] == 0:
+            answers.extend([None] * len(block))
+            continue
+        fits = np.ones((len(block), matrix.shape[0]), dtype=bool)
+        for k in np.nonzero((block < column_max).any(axis=0))[0]:
+            fits &= matrix[np.newaxis, :, k] <= block[:, k, np.newaxis]
+        first = fits.argmax(axis=1)
+        found = fits[np.arange(len(block)), first]
+        for i in range(len(block)):
+            answers.append(
+                dictionary.words_by_score[first[i]] if found[i] else None)
+    return answers
+
+
+def find_best_word_numpy(word_file, dataset_file):
+    dictionary = Dictionary(anagram_dictionary.load(word_file))
+    matrix = build_matrix(dictionary)
+    queries = read_words(dataset_file)
+    for word in best_word_batch(dictionary, matrix, queries):
+        if word is not None:
+            print(word)
+
+
+# Compare anagram_solver.best_word, the per-query NumPy path and the batched
+# NumPy path on the same dataset, and check that all of them give the same
+# answers.
+def benchmark(word_file, dataset_file):
+    begin = time.perf_counter()
+    dictionary = Dictionary(anagram_dictionary.load(word_file))
+    matrix = build_matrix(dictionary)
+    column_max = matrix.max(axis=0, initial=0)
+    queries = read_words(dataset_file)
+    print("%s: %d words, %d queries, preprocess %.3f s" % (
+        dataset_file, len(dictionary.words_by_score), len(queries),
+        time.perf_counter() - begin))
+
+    begin = time.perf_counter()
+    expected = [best_word(dictionary, query) for query in queries]
+    best_word_time = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    single = [best_word_numpy(dictionary, matrix, column_max, query)
+              for query in queries]
+    single_time = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    batch = best_word_batch(dictionary, matrix, queries)
+    batch_time = time.perf_counter() - begin
+
+    assert(single == expected)
+    assert(batch == expected)
+    for name, elapsed in [("best_word", best_word_time),
+                          ("numpy", single_time), ("numpy batch", batch_time)]:
+        print("  %-12s %8.3f s  %8.1f queries/s  x%.1f" % (
+            name, elapsed, len(queries) / elapsed, best_word_time / elapsed))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "--benchmark":
+        for dataset_file in sys.argv[3:]:
+            benchmark(sys.argv[2], dataset_file)
+    elif len(sys.argv) == 3:
+        find_best_word_numpy(sys.argv[1], sys.argv[2])
+    else:
+        print("usage: %s word_file dataset_file" % sys.argv[0])
+        print("       %s --benchmark word_file dataset_file..." % sys.argv[0])
+        exit(1)
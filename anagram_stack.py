@@ -0,0 +1,455 @@
+import multiprocessing, random, sys, time
+import anagram_dictionary
+import anagram_parallel
+import anagram_solver
+import anagram_solver_advanced
+import anagram_stats
+from anagram_solver_advanced import (MemoTable, SearchBudgetExceeded,
+                                     SearchResult, VECTORIZE_MIN,
+                                     can_construct_bitmask, fitting_children)
+
+# The searches of anagram_solver.best_words and
+# anagram_solver_advanced.search_words_advanced with an explicit stack
+# instead of recursion.
+#
+# The searches visit the nodes in the same order and find the same answers as
+# the recursive ones. Because the state of a node is data instead of a Python
+# frame, the search can also start from any child of the root: the top-level
+# frontier is split into independent subtrees that are searched by worker
+# processes, and their best answers are merged in the order of the subtrees.
+#
+# - best_words: The subtrees do not depend on each other, so the merged
+#   answers are the same as the sequential ones.
+# - best_words_advanced: Each subtree has its own MemoTable, and a complete
+#   anagram found in one subtree does not stop the others, so the merged
+#   answers can differ from the sequential ones (but are never worse than the
+#   best of the subtrees).
+
+# The SEARCH_THRESHOLD of anagram_solver.best_words.
+SEARCH_THRESHOLD = 4
+
+
+# Homework #3 with an explicit stack.
+#
+# |first|: If not None, only the subtree of the root's child |first| (a word
+#          position in |dictionary.words_by_length|) is searched.
+# Return value: (the set of words, the score, the number of searched nodes)
+def best_words_stack(dictionary, query, first=None):
+    words = dictionary.words_by_length
+    word_vectors = dictionary.vectors_by_length
+    word_scores = dictionary.scores_by_length
+    index = dictionary.index
+
+    # Return the node of the child 'i' of a node.
+    def child(i, score, unused_vector, candidates, depth):
+        new_unused_vector = [
+            unused_vector[k] - word_vectors[i][k] for k in range(26)]
+        new_candidates = index.narrow(
+            candidates, new_unused_vector, index.letters[i])
+        return (i + 1, score + word_scores[i], new_unused_vector,
+                new_candidates, depth + 1, words[i])
+
+    best_score = 0
+    best_answers = []
+    answers = []
+    nodes = 0
+
+    # A node is (index, score, unused_vector, candidates, depth, word), where
+    # 'word' is the last word of the node ('depth' words in total). The
+    # children are pushed in reverse order so that they are popped in order.
+    query_vector = anagram_solver.get_vector(query)
+    root = (0, 0, query_vector, index.find(query_vector), 0, None)
+    if first is None:
+        stack = [root]
+    else:
+        stack = [child(first, *root[1:5])]
+    while stack:
+        (start, score, unused_vector, candidates, depth,
+         word) = stack.pop()
+        nodes += 1
+        if depth > 0:
+            del answers[depth - 1:]
+            answers.append(word)
+
+        # Update the best score
+        if score > best_score:
+            best_score = score
+            best_answers = list(answers)
+
+        children = []
+        for i in anagram_solver.iterate_bits(candidates >> start << start):
+            if len(children) >= SEARCH_THRESHOLD - 1:
+                break
+            children.append(i)
+        for i in reversed(children):
+            stack.append(child(i, score, unused_vector, candidates, depth))
+    return (best_answers, best_score, nodes)
+
+
+# Return the root's children of best_words_stack() for |query|.
+def split_words(dictionary, query):
+    candidates = dictionary.index.find(anagram_solver.get_vector(query))
+    children = []
+    for i in anagram_solver.iterate_bits(candidates):
+        if len(children) >= SEARCH_THRESHOLD - 1:
+            break
+        children.append(i)
+    return children
+
+
+# search_words_advanced() with an explicit stack. The state that lives across
+# the iterative-deepening rounds (the best answers, the MemoTable and the
+# budget) is kept in the object.
+class StackSearch:
+    # The parameters are the same as search_words_advanced().
+    def __init__(self, table, query, time_limit=None, node_limit=None,
+                 memo_capacity=None, vectorized=True):
+        self.table = table
+        self.query = query
+        self.node_limit = node_limit
+        self.deadline = None
+        if time_limit is not None:
+            self.deadline = time.perf_counter() + time_limit
+        self.nodes = 0
+        self.query_score = anagram_solver_advanced.get_score(query)
+        self.query_bitmask = anagram_solver_advanced.get_bitmask(query)
+        self.best_score = 0
+        self.best_answers = []
+        self.valid_words = table.valid_indices(query)
+        self.length_offsets = table.length_offsets(self.valid_words,
+                                                   len(query))
+        self.lanes = None
+        query_vector = anagram_solver_advanced.get_vector(query)
+        if vectorized and max(query_vector, default=0) < 32:
+            self.lanes = table.lanes[:, self.valid_words]
+        self.memo = MemoTable(memo_capacity)
+
+    # Return (children, cutoff): the positions in 'valid_words' of the
+    # children of a node, and whether 'search_threshold' pruned any of them.
+    def children(self, index, unused_bitmask, unused_characters,
+                 search_threshold):
+        valid_words = self.valid_words
+        begin = max(index, self.length_offsets[unused_characters])
+        if (self.lanes is not None and
+                len(valid_words) - begin >= VECTORIZE_MIN):
+            children = fitting_children(self.lanes, begin, unused_bitmask,
+                                        search_threshold)
+        else:
+            bitmasks = self.table.bitmasks
+            children = []
+            for i in range(begin, len(valid_words)):
+                if can_construct_bitmask(bitmasks[valid_words[i]],
+                                         unused_bitmask):
+                    children.append(i)
+                    if len(children) >= search_threshold:
+                        break
+        if len(children) >= search_threshold:
+            return (children[:search_threshold - 1], True)
+        return (children, False)
+
+    # Return (children, cutoff) of the root for |search_threshold|.
+    def split(self, search_threshold):
+        return self.children(0, self.query_bitmask, len(self.query),
+                             search_threshold)
+
+    # Run one iterative-deepening round. Raise SearchBudgetExceeded when the
+    # budget runs out.
+    # |first|: If not None, only the subtree of the root's child |first| (a
+    #          position in 'valid_words') is searched.
+    # Return value: True if 'search_threshold' pruned any word.
+    def run(self, search_threshold, first=None):
+        # A frame is [index, score, unused_bitmask, unused_characters,
+        # children, next child, exact, stored] of a node whose children are
+        # being searched.
+        INDEX, SCORE, BITMASK, CHARACTERS, CHILDREN, NEXT, EXACT, STORED = \
+            range(8)
+        table = self.table
+        words = table.words
+        bitmasks = table.bitmasks
+        scores = table.scores
+        lengths = table.lengths
+        valid_words = self.valid_words
+        query_score = self.query_score
+        memo = self.memo
+        node_limit = self.node_limit
+        deadline = self.deadline
+        memo.start_round()
+        cutoff = False
+
+        answers = []
+        if first is None:
+            node = (0, 0, self.query_bitmask, len(self.query))
+        else:
+            word = valid_words[first]
+            answers.append(words[word])
+            node = (first + 1, scores[word],
+                    self.query_bitmask - bitmasks[word],
+                    len(self.query) - lengths[word])
+        stack = []
+        while True:
+            if node is not None:
+                # Enter 'node'. 'exact' is set if the node returns at once.
+                index, score, unused_bitmask, unused_characters = node
+                node = None
+                frame = None
+                self.nodes += 1
+                if node_limit is not None and self.nodes > node_limit:
+                    raise SearchBudgetExceeded()
+                if (deadline is not None and (self.nodes & 15) == 0 and
+                        time.perf_counter() > deadline):
+                    raise SearchBudgetExceeded()
+
+                # Update the best score
+                if score > self.best_score:
+                    self.best_score = score
+                    self.best_answers = list(answers)
+
+                # Finish searching when we found a complete anagram
+                if self.best_score == query_score:
+                    break
+
+                # Memorization
+                entry = memo.get(unused_bitmask)
+                if entry is None:
+                    entry = (len(valid_words), -1, False, memo.round)
+                memo_index, memo_score, memo_exact, memo_round = entry
+                if score <= memo_score and index >= memo_index:
+                    memo.hits += 1
+                    if memo_round != memo.round:
+                        memo.reuses += 1
+                    exact = memo_exact
+                else:
+                    memo.misses += 1
+                    stored = score > memo_score or (
+                        score == memo_score and index < memo_index)
+                    if stored:
+                        memo.put(unused_bitmask,
+                                 (index, score, False, memo.round))
+                    children, pruned = self.children(
+                        index, unused_bitmask, unused_characters,
+                        search_threshold)
+                    if pruned:
+                        cutoff = True
+                    frame = [index, score, unused_bitmask, unused_characters,
+                             children, 0, not pruned, stored]
+                    stack.append(frame)
+            else:
+                frame = stack[-1]
+                if frame[NEXT] < len(frame[CHILDREN]):
+                    # Go down to the next child.
+                    i = frame[CHILDREN][frame[NEXT]]
+                    frame[NEXT] += 1
+                    word = valid_words[i]
+                    answers.append(words[word])
+                    node = (i + 1, frame[SCORE] + scores[word],
+                            frame[BITMASK] - bitmasks[word],
+                            frame[CHARACTERS] - lengths[word])
+                    continue
+                # All the children are searched. Mark the entry as exact if
+                # it is still the entry of this node.
+                stack.pop()
+                exact = frame[EXACT]
+                if exact and frame[STORED]:
+                    entry = memo.get(frame[BITMASK])
+                    if entry is not None and \
+                            entry[:2] == (frame[INDEX], frame[SCORE]):
+                        memo.put(frame[BITMASK], (frame[INDEX], frame[SCORE],
+                                                  True, memo.round))
+                frame = None
+
+            if frame is not None:
+                continue
+            # The node returned 'exact' to its parent.
+            if not stack:
+                break
+            if not exact:
+                stack[-1][EXACT] = False
+            answers.pop()
+        return cutoff
+
+
+# search_words_advanced() with an explicit stack.
+def search_words_stack(table, query, time_limit=None, node_limit=None,
+                       memo_capacity=None, vectorized=True,
+                       thresholds=anagram_solver_advanced.SEARCH_THRESHOLDS):
+    search = StackSearch(table, query, time_limit, node_limit,
+                         memo_capacity, vectorized)
+    optimal = False
+    exhausted = False
+    for search_threshold in thresholds:
+        try:
+            cutoff = search.run(search_threshold)
+        except SearchBudgetExceeded:
+            exhausted = True
+            break
+        if search.best_score == search.query_score or not cutoff:
+            optimal = True
+            break
+        if search.best_score / search.query_score > 0.95:
+            break
+    if search.best_score == search.query_score:
+        optimal = True
+    return SearchResult(search.best_answers, search.best_score, optimal,
+                        exhausted, search.nodes, search.memo)
+
+
+def best_words_advanced_stack(table, query):
+    return search_words_stack(table, query).answers
+
+
+# The solvers that can be split.
+SOLVERS = ['best_words', 'best_words_advanced']
+
+
+# Search one subtree in a worker process (see anagram_parallel.init_worker).
+# |task|: (query, search_threshold, first). 'search_threshold' is None for
+#         best_words.
+# Return value: (answers, score, cutoff)
+def solve_subtree(task):
+    query, search_threshold, first = task
+    dictionary = anagram_parallel.worker_dictionary
+    if search_threshold is None:
+        answers, score, _ = best_words_stack(dictionary, query, first)
+        return (answers, score, False)
+    search = StackSearch(dictionary, query)
+    cutoff = search.run(search_threshold, first)
+    return (search.best_answers, search.best_score, cutoff)
+
+
+# Answer |query| by searching the subtrees of the root in |pool|.
+# |dictionary|: The Dictionary or the WordTable of the main process, used to
+#               split the root.
+def best_words_split(pool, solver, dictionary, query):
+    if solver == 'best_words':
+        best_answers, best_score = ([], 0)
+        tasks = [(query, None, first)
+                 for first in split_words(dictionary, query)]
+        for answers, score, _ in pool.imap(solve_subtree, tasks):
+            if score > best_score:
+                best_answers, best_score = (answers, score)
+        return best_answers
+
+    search = StackSearch(dictionary, query)
+    best_answers, best_score = ([], 0)
+    for search_threshold in anagram_solver_advanced.SEARCH_THRESHOLDS:
+        children, cutoff = search.split(search_threshold)
+        tasks = [(query, search_threshold, first) for first in children]
+        for answers, score, pruned in pool.imap(solve_subtree, tasks):
+            if score > best_score:
+                best_answers, best_score = (answers, score)
+            cutoff = cutoff or pruned
+        if best_score == search.query_score or not cutoff:
+            break
+        if best_score / search.query_score > 0.95:
+            break
+    return best_answers
+
+
+# Run |solver| on every query in |dataset_file|, splitting every query into
+# subtrees searched by |processes| worker processes (the number of CPUs if
+# None), and print the answers in order.
+def find_best_words_split(solver, word_file, dataset_file, processes=None):
+    assert(solver in SOLVERS)
+    compiled = anagram_dictionary.load(word_file)
+    if solver == 'best_words_advanced':
+        dictionary = anagram_solver_advanced.WordTable(compiled)
+    else:
+        dictionary = anagram_solver.Dictionary(compiled)
+    with multiprocessing.Pool(processes,
+                              initializer=anagram_parallel.init_worker,
+                              initargs=(solver, word_file)) as pool:
+        for query in anagram_solver.read_words(dataset_file):
+            print(" ".join(best_words_split(pool, solver, dictionary, query)),
+                  flush=True)
+
+
+# Run |solver| with an explicit stack on every query in |dataset_file| and
+# print the answers, the same as find_best_words and
+# find_best_words_advanced.
+def find_best_words_stack(solver, word_file, dataset_file):
+    assert(solver in SOLVERS)
+    compiled = anagram_dictionary.load(word_file)
+    if solver == 'best_words_advanced':
+        dictionary = anagram_solver_advanced.WordTable(compiled)
+    else:
+        dictionary = anagram_solver.Dictionary(compiled)
+    for query in anagram_solver.read_words(dataset_file):
+        if solver == 'best_words_advanced':
+            answers = best_words_advanced_stack(dictionary, query)
+        else:
+            answers = best_words_stack(dictionary, query)[0]
+        print(" ".join(answers))
+
+
+# For a given Dictionary and query, check that best_words_stack() gives the
+# same answers after the same number of nodes as anagram_solver.best_words(),
+# and that merging its subtrees gives the same answers as well.
+def check_best_words(dictionary, query):
+    stats = anagram_stats.SearchStats()
+    expected = anagram_solver.best_words(dictionary, query, stats)
+    answers, score, nodes = best_words_stack(dictionary, query)
+    if answers != expected or nodes != stats.nodes:
+        print(dictionary.words_by_length, query)
+        print("best_words answered %s (%d nodes) but best_words_stack "
+              "answered %s (%d nodes)" % (expected, stats.nodes, answers,
+                                          nodes))
+        exit(0)
+    best_answers, best_score = ([], 0)
+    for first in split_words(dictionary, query):
+        answers, score, _ = best_words_stack(dictionary, query, first)
+        if score > best_score:
+            best_answers, best_score = (answers, score)
+    assert(best_answers == expected)
+
+
+# For a given WordTable and query, check that search_words_stack() gives the
+# same result after the same nodes and memo lookups as
+# anagram_solver_advanced.search_words_advanced().
+def check_search_words(table, query):
+    for options in ({}, {'vectorized': False}, {'memo_capacity': 5},
+                    {'node_limit': 30}):
+        result = anagram_solver_advanced.search_words_advanced(
+            table, query, **options)
+        result_stack = search_words_stack(table, query, **options)
+        fields = [(result.answers, result.score, result.optimal,
+                   result.exhausted, result.nodes, result.memo.hits,
+                   result.memo.reuses, result.memo.misses,
+                   result.memo.evictions)
+                  for result in (result, result_stack)]
+        if fields[0] != fields[1]:
+            print(table.words, query, options)
+            print("search_words_advanced: %s" % (fields[0],))
+            print("search_words_stack:    %s" % (fields[1],))
+            exit(0)
+
+
+# Run tests.
+def run_tests():
+    for iteration in range(100):
+        words = [anagram_solver.random_word(1, 6)
+                 for i in range(random.randint(0, 60))]
+        compiled = anagram_dictionary.build(words)
+        dictionary = anagram_solver.Dictionary(compiled)
+        table = anagram_solver_advanced.WordTable(compiled)
+        for trial in range(5):
+            query = anagram_solver.random_word(0, 14)
+            check_best_words(dictionary, query)
+            check_search_words(table, query)
+    print("All tests pass!")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        run_tests()
+    elif len(sys.argv) == 4 and sys.argv[1] in SOLVERS:
+        find_best_words_stack(sys.argv[1], sys.argv[2], sys.argv[3])
+    elif (len(sys.argv) in (5, 6) and sys.argv[1] == '--split' and
+          sys.argv[2] in SOLVERS):
+        find_best_words_split(sys.argv[2], sys.argv[3], sys.argv[4],
+                              int(sys.argv[5]) if len(sys.argv) == 6 else None)
+    else:
+        print("usage: %s [solver word_file dataset_file]" % sys.argv[0])
+        print("       %s --split solver word_file dataset_file [processes]" %
+              sys.argv[0])
+        print("solver: %s" % ", ".join(SOLVERS))
+        exit(1)
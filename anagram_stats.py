@@ -0,0 +1,99 @@
+import json, sys, time
+import anagram_dictionary
+import anagram_solver
+import anagram_solver_advanced
+
+# Search tree counters of find_best_words (anagram_solver) and
+# find_best_words_advanced (anagram_solver_advanced), written as one JSON line
+# per query to see why some queries are slow.
+#
+# The searches take an optional SearchStats. When it is None, the only cost in
+# the search is an "is not None" check per node.
+
+
+# The counters of the search of one query.
+#
+# |self.nodes|: The number of expanded nodes.
+# |self.can_construct|: The number of words tested against the unused
+#                       characters. best_words() tests them with the
+#                       sub-multiset index, so this is the number of narrow()
+#                       calls instead.
+# |self.cutoffs|: The number of nodes whose children were pruned by the
+#                 search threshold.
+# |self.memo_prunes|: The number of nodes pruned by the memo (advanced only).
+# |self.early_exits|: The number of searches that stopped early because a
+#                     complete anagram was found, counted once per search
+#                     (advanced only).
+# |self.max_depth|: The maximum number of words in a node.
+class SearchStats:
+    def __init__(self):
+        self.nodes = 0
+        self.can_construct = 0
+        self.cutoffs = 0
+        self.memo_prunes = 0
+        self.early_exits = 0
+        self.max_depth = 0
+
+    # Count a node with |depth| words.
+    def visit(self, depth):
+        self.nodes += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    # Return the JSON line of |query| that took |seconds|.
+    def to_json(self, query, seconds):
+        return json.dumps({
+            'query': query,
+            'seconds': round(seconds, 6),
+            'nodes': self.nodes,
+            'can_construct': self.can_construct,
+            'cutoffs': self.cutoffs,
+            'memo_prunes': self.memo_prunes,
+            'early_exits': self.early_exits,
+            'max_depth': self.max_depth,
+        })
+
+
+# The solvers that can be instrumented.
+SOLVERS = ['best_words', 'best_words_advanced']
+
+
+# Run |solver| on every query in |dataset_file|, print the answers the same
+# as find_best_words and find_best_words_advanced, and write the counters of
+# every query to |stats_file| (stderr if None or "-") as JSON lines.
+def find_with_stats(solver, word_file, dataset_file, stats_file=None):
+    assert(solver in SOLVERS)
+    compiled = anagram_dictionary.load(word_file)
+    if solver == 'best_words_advanced':
+        dictionary = anagram_solver_advanced.WordTable(compiled)
+    else:
+        dictionary = anagram_solver.Dictionary(compiled)
+    if stats_file is None or stats_file == '-':
+        output = sys.stderr
+    else:
+        output = open(stats_file, 'w')
+
+    for query in anagram_solver.read_words(dataset_file):
+        stats = SearchStats()
+        start = time.perf_counter()
+        if solver == 'best_words':
+            answers = anagram_solver.best_words(dictionary, query, stats)
+        else:
+            answers = anagram_solver_advanced.best_words_advanced(
+                dictionary, query, stats)
+        seconds = time.perf_counter() - start
+        print(" ".join(answers))
+        print(stats.to_json(query, seconds), file=output, flush=True)
+
+    if output is not sys.stderr:
+        output.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (4, 5) or sys.argv[1] not in SOLVERS:
+        print("usage: %s solver word_file dataset_file [stats_file]" %
+              sys.argv[0])
+        print("solver: %s" % ", ".join(SOLVERS))
+        exit(1)
+    find_with_stats(sys.argv[1], sys.argv[2], sys.argv[3],
+                    sys.argv[4] if len(sys.argv) == 5 else None)
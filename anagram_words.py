@@ -0,0 +1,56 @@
+# The character scores and the per-word helpers shared by anagram_solver.py,
+# anagram_solver_advanced.py and anagram_dictionary.py. This module imports
+# nothing, so that anagram_solver.py and the compiled dictionary do not
+# depend on NumPy through anagram_solver_advanced.py.
+
+
+# SCORES of the characters:
+# ----------------------------------------
+# | 1 point  | a, e, h, i, n, o, r, s, t |
+# | 2 points | c, d, l, m, u             |
+# | 3 points | b, f, g, p, v, w, y       |
+# | 4 points | j, k, q, x, z             |
+# ----------------------------------------
+SCORES = [1, 3, 2, 2, 1, 3, 3, 1, 1, 4, 4, 2, 2, 1, 1, 3, 4, 1, 1, 1, 2, 3, 3, 4, 3, 4]
+
+
+# Calculate the score of a given word.
+def get_score(word):
+    score = 0
+    for character in list(word):
+        score += SCORES[ord(character) - ord('a')]
+    return score
+
+
+# Build the occurrence vector of characters in a given word.
+def get_vector(word):
+    vector = [0] * 26
+    for character in list(word):
+        vector[ord(character) - ord('a')] += 1
+    return vector
+
+
+# Read a given file and return a list of words.
+def read_words(file):
+    words = []
+    with open(file) as file:
+        for line in file:
+            word = line.rstrip('\n')
+            words.append(word)
+    return words
+
+
+# SWAR (SIMD Within A Register)
+BITS_PER_CHAR = 7
+
+# Calculate a bitmask for a given word.
+def get_bitmask(word):
+    bitmask = 0
+    vector = [0] * 26
+    for character in word:
+        index = ord(character) - ord('a')
+        shift = index * BITS_PER_CHAR
+        bitmask += (1 << shift)
+        vector[index] += 1
+        assert(vector[index] < (1 << (BITS_PER_CHAR - 1)))
+    return bitmask
@@ -0,0 +1,148 @@
+import random, sys, time, tracemalloc
+from array import array
+import cache_expected
+
+# The same cache as cache_expected.Cache, stored in preallocated arrays
+# instead of one dictionary per node.
+#
+# The cache has n slots, numbered 0, ..., n-1. The URL and the contents of a
+# slot are stored in two lists, and the doubly linked list of the slots (most
+# recently accessed first) is stored in two integer arrays, |self.prev| and
+# |self.next|, indexed by slot. Slot n is the sentinel: next[n] is the most
+# recently accessed slot and prev[n] the least recently accessed one. A
+# dictionary maps a URL to its slot.
+#
+# When the cache is full, the least recently accessed slot is reused for the
+# new page, so nothing is allocated after the cache is filled except the
+# dictionary entries.
+
+
+class ArrayCache:
+    # Initialize the cache.
+    # |n|: The size of the cache.
+    def __init__(self, n):
+        assert(n >= 1)
+        self.n = n
+        self.count = 0
+        self.urls = [None] * n
+        self.contents = [None] * n
+        self.prev = array('q', [n]) * (n + 1)
+        self.next = array('q', [n]) * (n + 1)
+        self.url_to_slot = {}
+
+    # Remove |slot| from the list.
+    def unlink(self, slot):
+        prev = self.prev[slot]
+        next = self.next[slot]
+        self.next[prev] = next
+        self.prev[next] = prev
+
+    # Access a page and update the cache so that it stores the most recently
+    # accessed N pages, in O(1).
+    # |url|: The accessed URL
+    # |contents|: The contents of the URL
+    def access_page(self, url, contents):
+        n = self.n
+        slot = self.url_to_slot.get(url)
+        if slot is not None:
+            self.unlink(slot)
+        else:
+            if self.count >= n:
+                # Reuse the least recently accessed slot.
+                slot = self.prev[n]
+                self.unlink(slot)
+                del self.url_to_slot[self.urls[slot]]
+            else:
+                slot = self.count
+                self.count += 1
+            self.urls[slot] = url
+            self.contents[slot] = contents
+            self.url_to_slot[url] = slot
+        first = self.next[n]
+        self.prev[slot] = n
+        self.next[slot] = first
+        self.prev[first] = slot
+        self.next[n] = slot
+
+    # Return the URLs stored in the cache. The URLs are ordered in the order
+    # in which the URLs are mostly recently accessed.
+    def get_pages(self):
+        n = self.n
+        slot = self.next[n]
+        urls = []
+        while slot != n:
+            assert(self.url_to_slot[self.urls[slot]] == slot)
+            assert(self.next[self.prev[slot]] == slot)
+            urls.append(self.urls[slot])
+            slot = self.next[slot]
+        assert(len(urls) == self.count)
+        return urls
+
+
+# Access random pages in a Cache and an ArrayCache of size |n| and check that
+# they store the same pages in the same order.
+def check_same_pages(n, accesses, urls):
+    cache = cache_expected.Cache(n)
+    array_cache = ArrayCache(n)
+    for access in range(accesses):
+        url = random.choice(urls)
+        cache.access_page(url, url.upper())
+        array_cache.access_page(url, url.upper())
+        if cache.get_pages() != array_cache.get_pages():
+            print(n, cache.get_pages(), array_cache.get_pages())
+            print("ArrayCache differs from Cache")
+            exit(0)
+
+
+# Run tests.
+def run_tests():
+    cache_expected.cache_test(ArrayCache)
+    for iteration in range(200):
+        n = random.randint(1, 10)
+        urls = ["%d.com" % i for i in range(random.randint(1, 20))]
+        check_same_pages(n, 100, urls)
+    print("All tests pass!")
+
+
+# Fill a cache of |entries| pages, then access |accesses| random pages out of
+# 2 x |entries| URLs (so about half of them are hits), and report the memory
+# of the filled cache and the accesses per second.
+def benchmark(entries, accesses):
+    urls = ["https://example.com/page/%d" % i for i in range(2 * entries)]
+    pattern = [random.choice(urls) for i in range(accesses)]
+    for cache_class in (cache_expected.Cache, ArrayCache):
+        # Memory: trace the allocations of filling the cache. The URLs are
+        # allocated beforehand, so they are not counted.
+        tracemalloc.start()
+        cache = cache_class(entries)
+        for url in urls[:entries]:
+            cache.access_page(url, url)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del cache
+
+        start = time.perf_counter()
+        cache = cache_class(entries)
+        for url in urls[:entries]:
+            cache.access_page(url, url)
+        fill_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for url in pattern:
+            cache.access_page(url, url)
+        access_time = time.perf_counter() - start
+        del cache
+        print("%-12s %d entries: %7.1f MB (%5.1f bytes/entry), "
+              "fill %9.0f ops/s, access %9.0f ops/s" % (
+                  cache_class.__name__, entries, memory / 1e6,
+                  memory / entries, entries / fill_time,
+                  accesses / access_time))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        benchmark(int(sys.argv[1]), int(sys.argv[2]))
+    elif len(sys.argv) == 1:
+        run_tests()
+    else:
+        print("usage: %s [entries accesses]" % sys.argv[0])
+        exit(1)
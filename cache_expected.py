@@ -64,9 +64,10 @@ class Cache:
         return urls
 
 
-def cache_test():
+# |cache_class|: The class under test. It must behave the same as Cache.
+def cache_test(cache_class=Cache):
     # Set the size of the cache to 4.
-    cache = Cache(4)
+    cache = cache_class(4)
 
     # Initially, no page is cached.
     assert cache.get_pages() == []
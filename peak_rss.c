@@ -0,0 +1,43 @@
+#include <stdio.h>
+#include <stdlib.h>
+#include <sys/resource.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+// Run a command and print its peak resident set size in KiB to stderr as
+// "peak_rss_kib <n>". The standard output of the command is passed through.
+//
+// On Linux, a child starts with the RSS high-water mark of the process that
+// forked it, and exec does not reset it, so ru_maxrss of a child of a large
+// process (e.g. a Python harness with NumPy loaded) never drops below the
+// RSS of the parent. This wrapper is small, so the mark it passes on is
+// negligible.
+//
+// usage: peak_rss command [args...]
+int main(int argc, char** argv) {
+  if (argc < 2) {
+    fprintf(stderr, "usage: %s command [args...]\n", argv[0]);
+    exit(1);
+  }
+  pid_t pid = fork();
+  if (pid < 0) {
+    perror("fork");
+    exit(1);
+  }
+  if (pid == 0) {
+    execvp(argv[1], argv + 1);
+    perror("execvp");
+    _exit(127);
+  }
+  int status;
+  struct rusage usage;
+  if (wait4(pid, &status, 0, &usage) < 0) {
+    perror("wait4");
+    exit(1);
+  }
+  fprintf(stderr, "peak_rss_kib %ld\n", usage.ru_maxrss);
+  if (WIFEXITED(status)) {
+    return WEXITSTATUS(status);
+  }
+  return 1;
+}
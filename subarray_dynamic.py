@@ -0,0 +1,251 @@
+import math, random, sys, time
+from subarray_expected import solve_n, solve_n3
+
+# A dynamic version of the maximum subarray with length >= K: the array
+# changes one element at a time, and the answer for any range of it can be
+# queried in O(log N) instead of running solve_n() again.
+#
+# With the prefix sums P[0] = 0, P[j] = L[0] + ... + L[j-1], a subarray L[i:j]
+# with j - i >= K has the sum P[j] - P[i]. Substituting t = i + K and
+# Q[t] = P[t-K], the answer for L[lo:hi] is
+#
+#   max of P[j] - Q[t] over lo + K <= t <= j <= hi
+#
+# which a segment tree over the positions t = 0, ..., N answers by merging
+# three values per node:
+#
+#   max_p: The maximum P[t] in the node.
+#   min_q: The minimum Q[t] in the node (infinity for t < K).
+#   best:  The maximum P[j] - Q[t] with t <= j in the node.
+#
+#   best(left + right) = max(best(left), best(right),
+#                            max_p(right) - min_q(left))
+#
+# Changing L[x] by d adds d to P[t] for t > x and to Q[t] for t > x + K. Both
+# are range additions, which are applied lazily (max_p += a, min_q += b,
+# best += a - b for a whole node), so an update is O(log N) as well.
+#
+# Q depends on K, so K is fixed when the structure is built. Each K needs its
+# own structure.
+
+INFINITY = math.inf
+
+
+class DynamicSubarray:
+    # |L|: The initial array.
+    # |K|: The minimum length of the subarrays.
+    def __init__(self, L, K):
+        assert(K >= 1)
+        self.K = K
+        self.build(list(L))
+
+    # Build the tree for |L|, with room for at least one more element.
+    def build(self, L):
+        self.L = L
+        self.total = sum(L)
+        # The positions are t = 0, ..., len(L).
+        self.capacity = 1
+        while self.capacity < len(L) + 2:
+            self.capacity *= 2
+        size = 2 * self.capacity
+        self.max_p = [-INFINITY] * size
+        self.min_q = [INFINITY] * size
+        self.best = [-INFINITY] * size
+        self.add_p = [0] * size
+        self.add_q = [0] * size
+        prefix = [0]
+        for value in L:
+            prefix.append(prefix[-1] + value)
+        for t in range(len(prefix)):
+            node = self.capacity + t
+            self.max_p[node] = prefix[t]
+            if t >= self.K:
+                self.min_q[node] = prefix[t - self.K]
+            self.best[node] = self.max_p[node] - self.min_q[node]
+        for node in range(self.capacity - 1, 0, -1):
+            self.pull(node)
+
+    def __len__(self):
+        return len(self.L)
+
+    # Recalculate |node| from its children.
+    def pull(self, node):
+        left = 2 * node
+        right = left + 1
+        self.max_p[node] = max(self.max_p[left], self.max_p[right])
+        self.min_q[node] = min(self.min_q[left], self.min_q[right])
+        self.best[node] = max(self.best[left], self.best[right],
+                              self.max_p[right] - self.min_q[left])
+
+    # Add |a| to every P and |b| to every Q in |node|.
+    def apply(self, node, a, b):
+        self.max_p[node] += a
+        self.min_q[node] += b
+        self.best[node] += a - b
+        if node < self.capacity:
+            self.add_p[node] += a
+            self.add_q[node] += b
+
+    # Pass the pending additions of |node| to its children.
+    def push(self, node):
+        a = self.add_p[node]
+        b = self.add_q[node]
+        if a or b:
+            self.apply(2 * node, a, b)
+            self.apply(2 * node + 1, a, b)
+            self.add_p[node] = 0
+            self.add_q[node] = 0
+
+    # Add |a| to P[t] and |b| to Q[t] for |begin| <= t < |end|.
+    # |node| covers the positions |node_begin| <= t < |node_end|.
+    def add(self, begin, end, a, b, node, node_begin, node_end):
+        if end <= node_begin or node_end <= begin:
+            return
+        if begin <= node_begin and node_end <= end:
+            self.apply(node, a, b)
+            return
+        self.push(node)
+        middle = (node_begin + node_end) // 2
+        self.add(begin, end, a, b, 2 * node, node_begin, middle)
+        self.add(begin, end, a, b, 2 * node + 1, middle, node_end)
+        self.pull(node)
+
+    # Return the leaf of position |t| after pushing the pending additions
+    # down to it.
+    def leaf(self, t):
+        node = 1
+        node_begin, node_end = 0, self.capacity
+        while node < self.capacity:
+            self.push(node)
+            middle = (node_begin + node_end) // 2
+            if t < middle:
+                node, node_end = 2 * node, middle
+            else:
+                node, node_begin = 2 * node + 1, middle
+        return node
+
+    # Return (max_p, min_q, best) of |begin| <= t < |end|.
+    def summary(self, begin, end, node, node_begin, node_end):
+        if end <= node_begin or node_end <= begin:
+            return (-INFINITY, INFINITY, -INFINITY)
+        if begin <= node_begin and node_end <= end:
+            return (self.max_p[node], self.min_q[node], self.best[node])
+        self.push(node)
+        middle = (node_begin + node_end) // 2
+        left = self.summary(begin, end, 2 * node, node_begin, middle)
+        right = self.summary(begin, end, 2 * node + 1, middle, node_end)
+        return (max(left[0], right[0]), min(left[1], right[1]),
+                max(left[2], right[2], right[0] - left[1]))
+
+    # Set L[|x|] to |value|.
+    def update(self, x, value):
+        assert(0 <= x < len(self.L))
+        d = value - self.L[x]
+        self.L[x] = value
+        self.total += d
+        self.add(x + 1, self.capacity, d, 0, 1, 0, self.capacity)
+        self.add(x + 1 + self.K, self.capacity, 0, d, 1, 0, self.capacity)
+
+    # Append |value| to L.
+    def append(self, value):
+        t = len(self.L) + 1
+        if t >= self.capacity:
+            self.build(self.L + [value])
+            return
+        q = INFINITY
+        if t >= self.K:
+            q = self.max_p[self.leaf(t - self.K)]
+        self.L.append(value)
+        self.total += value
+        node = self.leaf(t)
+        self.max_p[node] = self.total
+        self.min_q[node] = q
+        self.best[node] = self.total - q
+        node //= 2
+        while node >= 1:
+            self.pull(node)
+            node //= 2
+
+    # Return the maximum sum of a subarray of L[|begin|:|end|] with length
+    # >= K, or -inf if L[begin:end] is shorter than K (as solve_n3()).
+    def query(self, begin=0, end=None):
+        if end is None:
+            end = len(self.L)
+        assert(0 <= begin <= end <= len(self.L))
+        if end - begin < self.K:
+            return -INFINITY
+        return self.summary(begin + self.K, end + 1, 1, 0, self.capacity)[2]
+
+
+# Apply random updates, appends and queries to a DynamicSubarray and check
+# every query against solve_n3().
+def check_operations(L, K, operations):
+    dynamic = DynamicSubarray(L, K)
+    L = list(L)
+    for operation in range(operations):
+        kind = random.randint(0, 2)
+        if kind == 0 and L:
+            x = random.randrange(len(L))
+            L[x] = random.randint(-10, 10)
+            dynamic.update(x, L[x])
+        elif kind == 1:
+            L.append(random.randint(-10, 10))
+            dynamic.append(L[-1])
+        else:
+            begin = random.randint(0, len(L))
+            end = random.randint(begin, len(L))
+            answer_n3 = solve_n3(L[begin:end], K)
+            answer = dynamic.query(begin, end)
+            if answer != answer_n3:
+                print(L, K, begin, end)
+                print("Correct answer is %s but the dynamic algorithm "
+                      "answered %s" % (answer_n3, answer))
+                exit(0)
+
+
+# Run tests.
+def run_tests():
+    dynamic = DynamicSubarray([2, -1, -1, -1, 4, -1, 3, 1], 3)
+    assert(dynamic.query() == 7)
+    dynamic.update(5, -10)
+    assert(dynamic.query() == 3)
+    dynamic.append(5)
+    assert(dynamic.query() == 9)
+
+    # Generate many test cases and run.
+    for iteration in range(300):
+        length = random.randint(0, 20)
+        L = [random.randint(-10, 10) for i in range(length)]
+        K = random.randint(1, length + 3)
+        check_operations(L, K, 50)
+    print("All tests pass!")
+
+
+# Compare an update followed by a query with running solve_n() again, on a
+# random array of |N| integers.
+def benchmark(N, K, operations=1000):
+    L = [random.randint(-1000, 1000) for i in range(N)]
+    dynamic = DynamicSubarray(L, K)
+    start = time.perf_counter()
+    for operation in range(operations):
+        x = random.randrange(N)
+        L[x] = random.randint(-1000, 1000)
+        dynamic.update(x, L[x])
+        answer = dynamic.query()
+    dynamic_time = (time.perf_counter() - start) / operations
+    start = time.perf_counter()
+    answer_n = solve_n(L, K)
+    n_time = time.perf_counter() - start
+    assert(answer == answer_n)
+    print("N=%d K=%d: solve_n %.3f ms, update + query %.3f ms" % (
+        N, K, 1000 * n_time, 1000 * dynamic_time))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        benchmark(int(sys.argv[1]), int(sys.argv[2]))
+    elif len(sys.argv) == 1:
+        run_tests()
+    else:
+        print("usage: %s [N K]" % sys.argv[0])
+        exit(1)
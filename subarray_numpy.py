@@ -0,0 +1,201 @@
+import random, sys, time
+import numpy as np
+from subarray_expected import solve_n, solve_n2, solve_n3
+
+# The maximum subarray with length >= K, vectorized with NumPy for very large
+# arrays.
+#
+# With the prefix sums P[0] = 0, P[j] = L[0] + ... + L[j-1], the sum of
+# L[i:j] is P[j] - P[i]. For a fixed end j, the best start is the i <= j - K
+# that minimizes P[i], so the answer is
+#
+#   max over j = K, ..., N of (P[j] - min(P[0], ..., P[j-K]))
+#
+# P is calculated with np.cumsum, and the running minimum of P with
+# np.minimum.accumulate. The running minimum is calculated BLOCK elements at a
+# time (carrying the minimum of the previous blocks), so the extra memory is
+# P plus a few blocks instead of several arrays of length N.
+#
+# Integer arrays are summed as int64 and the others as float64. int64 sums
+# are exact as long as they do not overflow; float64 sums can differ from
+# solve_n() in the last bits because they are added in a different order.
+
+# The number of elements of the running minimum calculated at once.
+BLOCK = 1 << 22
+
+
+# Return the prefix sums of |L| (N + 1 elements, starting with 0) as int64 if
+# |L| is an integer array and as float64 otherwise.
+def prefix_sums(L):
+    if np.issubdtype(L.dtype, np.integer) or L.dtype == bool:
+        dtype = np.int64
+    else:
+        dtype = np.float64
+    prefix = np.empty(len(L) + 1, dtype=dtype)
+    prefix[0] = 0
+    np.cumsum(L, dtype=dtype, out=prefix[1:])
+    return prefix
+
+
+# Return (max_sum, start, end): the maximum sum of a subarray of |L| whose
+# length is at least |K|, and the subarray L[start:end] that achieves it. If
+# several subarrays achieve it, the one with the smallest end, and then the
+# smallest start, is returned.
+def solve_numpy(L, K):
+    L = np.asarray(L)
+    N = len(L)
+    assert(1 <= K <= N)
+    prefix = prefix_sums(L)
+
+    best_sum = None
+    best_end = 0
+    minimum = None
+    # The running minimum of prefix[0:N-K+1] is calculated block by block,
+    # and prefix[t+K] - (minimum of prefix[0:t+1]) is the best sum of the
+    # subarrays that end at t + K.
+    for begin in range(0, N - K + 1, BLOCK):
+        end = min(begin + BLOCK, N - K + 1)
+        running = np.minimum.accumulate(prefix[begin:end])
+        if minimum is not None:
+            np.minimum(running, minimum, out=running)
+        minimum = running[-1]
+        sums = prefix[begin + K:end + K] - running
+        t = int(np.argmax(sums))
+        if best_sum is None or sums[t] > best_sum:
+            best_sum = sums[t]
+            best_end = begin + t + K
+    best_start = int(np.argmin(prefix[:best_end - K + 1]))
+    return (best_sum.item(), best_start, best_end)
+
+
+# Return the answers of solve_n(L, K) for K = 1, ..., N as a list (the K-th
+# answer at index K - 1), or for every K in |Ks| if it is not None.
+#
+# The answer for K is the maximum over k >= K of the best sum of the
+# subarrays of length exactly k, which is max(P[k:] - P[:N-k+1]). The best
+# sums are calculated from k = N down to the smallest K, one NumPy operation
+# per k, and the answers are their running maximum. This is O(N^2) work like
+# calling solve_n() N times, but every step is vectorized instead of a Python
+# loop.
+def solve_all_k(L, Ks=None):
+    L = np.asarray(L)
+    N = len(L)
+    if Ks is not None:
+        for K in Ks:
+            assert(1 <= K <= N)
+        smallest = min(Ks, default=N)
+    else:
+        smallest = 1
+    prefix = prefix_sums(L)
+    answers = [None] * (N + 1)
+    best = None
+    for k in range(N, smallest - 1, -1):
+        exact = np.max(prefix[k:] - prefix[:N - k + 1])
+        if best is None or exact > best:
+            best = exact
+        answers[k] = best.item()
+    if Ks is not None:
+        return [answers[K] for K in Ks]
+    return answers[1:]
+
+
+# For a given L, check that solve_all_k() answers the same as solve_n3() and
+# solve_n2() for every K.
+def check_all_answers(L):
+    answers = solve_all_k(L)
+    for K in range(1, len(L) + 1):
+        answer_n3 = solve_n3(L, K)
+        answer_n2 = solve_n2(L, K)
+        if answer_n3 != answer_n2 or answers[K - 1] != answer_n3:
+            print(L, K)
+            print("Correct answer is %d but the all-K algorithm answered %d"
+                  % (answer_n3, answers[K - 1]))
+            exit(0)
+    Ks = random.sample(range(1, len(L) + 1), random.randint(1, len(L)))
+    assert(solve_all_k(L, Ks) == [answers[K - 1] for K in Ks])
+
+
+# For a given L and K, check that solve_numpy() answers the same as solve_n()
+# and that the returned subarray achieves the answer.
+def check_answers(L, K):
+    answer_n = solve_n(L, K)
+    answer, start, end = solve_numpy(L, K)
+    if answer != answer_n or end - start < K or sum(L[start:end]) != answer:
+        print(L, K)
+        print("Correct answer is %d but the NumPy algorithm answered %d "
+              "(L[%d:%d])" % (answer_n, answer, start, end))
+        exit(0)
+
+
+# Run tests.
+def run_tests():
+    check_answers([2, -1, -1, -1, 4, -1, 3, 1], 3)
+    check_answers([-3, -2, -5], 1)
+    check_answers([-3, -2, -5], 3)
+
+    # Generate many test cases and run. A small BLOCK checks the carry of the
+    # running minimum between blocks.
+    global BLOCK
+    saved_block = BLOCK
+    for BLOCK in (saved_block, 3):
+        for iteration in range(300):
+            length = random.randint(1, 30)
+            L = [random.randint(-10, 10) for i in range(length)]
+            for K in range(1, length + 1):
+                check_answers(L, K)
+    BLOCK = saved_block
+
+    for iteration in range(300):
+        length = random.randint(1, 30)
+        check_all_answers([random.randint(-10, 10) for i in range(length)])
+
+    # float64 arrays with values that are summed exactly.
+    for iteration in range(100):
+        length = random.randint(1, 30)
+        L = [random.randint(-10, 10) / 4 for i in range(length)]
+        for K in range(1, length + 1):
+            check_answers(L, K)
+    print("All tests pass!")
+
+
+# Compare solve_numpy() with solve_n() on a random array of |N| integers.
+def benchmark(N, K):
+    L = np.random.randint(-1000, 1000, size=N, dtype=np.int64)
+    start = time.perf_counter()
+    answer = solve_numpy(L, K)
+    numpy_time = time.perf_counter() - start
+    values = L.tolist()
+    start = time.perf_counter()
+    answer_n = solve_n(values, K)
+    n_time = time.perf_counter() - start
+    assert(answer[0] == answer_n)
+    print("N=%d K=%d: solve_n %.3f s, solve_numpy %.3f s (%.1fx)" % (
+        N, K, n_time, numpy_time, n_time / numpy_time))
+
+
+# Compare solve_all_k() with calling solve_n() for every K on a random array
+# of |N| integers.
+def benchmark_all_k(N):
+    L = np.random.randint(-1000, 1000, size=N, dtype=np.int64)
+    start = time.perf_counter()
+    answers = solve_all_k(L)
+    all_k_time = time.perf_counter() - start
+    values = L.tolist()
+    start = time.perf_counter()
+    answers_n = [solve_n(values, K) for K in range(1, N + 1)]
+    n_time = time.perf_counter() - start
+    assert(answers == answers_n)
+    print("N=%d, all K: solve_n %.3f s, solve_all_k %.3f s (%.1fx)" % (
+        N, n_time, all_k_time, n_time / all_k_time))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        benchmark(int(sys.argv[1]), int(sys.argv[2]))
+    elif len(sys.argv) == 2:
+        benchmark_all_k(int(sys.argv[1]))
+    elif len(sys.argv) == 1:
+        run_tests()
+    else:
+        print("usage: %s [N [K]]" % sys.argv[0])
+        exit(1)
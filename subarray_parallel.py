@@ -0,0 +1,185 @@
+import math, multiprocessing, random, sys, time
+from multiprocessing import shared_memory
+import numpy as np
+from subarray_expected import solve_n
+from subarray_numpy import prefix_sums
+
+# The maximum subarray with length >= K, divided into chunks that are solved
+# by a pool of worker processes.
+#
+# L is copied once into shared memory, and the workers read their chunks from
+# it, so only the chunk boundaries and the summaries are pickled. Every chunk
+# L[a:b] is at least K long. With the chunk's own prefix sums p (p[0] = 0,
+# p[n] = sum(L[a:b])), the worker returns a summary:
+#
+#   total:    p[n].
+#   internal: The best sum of a subarray of length >= K inside the chunk.
+#   max_p:    max(p).
+#   min_head: min(p[0], ..., p[n-K]), the prefix sums that any subarray
+#             ending in a later chunk can start from.
+#   head:     head[d-1] = max(p[d], ..., p[n]) for d = 1, ..., K-1.
+#   tail:     p[n-K+1], ..., p[n-1], the prefix sums that can only start a
+#             subarray ending at least K positions later.
+#
+# The parent adds the chunks in order, with 'offset' the sum of the previous
+# chunks and 'far' the minimum of the global prefix sums at least K positions
+# before the chunk. A subarray L[i:j] ending in the chunk (a < j <= b) either
+# starts inside it (internal), or at i <= a - K (offset + max_p - far), or at
+# a - K < i < a in the tail of the previous chunk (offset + head[d-1] minus
+# that prefix sum, for d = i - a + K). The summaries are O(K) in size, so
+# merging them takes O(K) per chunk.
+
+# The number of chunks per process.
+CHUNKS_PER_PROCESS = 4
+
+# The state of a worker process, set by init_worker().
+worker_memory = None
+worker_array = None
+
+
+# Attach the shared memory |name| of |N| elements of |dtype| in a worker.
+def init_worker(name, N, dtype):
+    global worker_memory, worker_array
+    worker_memory = shared_memory.SharedMemory(name=name)
+    worker_array = np.ndarray(N, dtype=dtype, buffer=worker_memory.buf)
+
+
+# Return the summary of L[|begin|:|end|] described above.
+def summarize(task):
+    begin, end, K = task
+    p = prefix_sums(worker_array[begin:end])
+    n = end - begin
+    running = np.minimum.accumulate(p[:n - K + 1])
+    internal = np.max(p[K:] - running)
+    suffix_max = np.maximum.accumulate(p[::-1])[::-1]
+    return (p[n].item(), internal.item(), suffix_max[0].item(),
+            running[-1].item(), suffix_max[1:K].copy(),
+            p[n - K + 1:n].copy())
+
+
+# Combine the summaries of the chunks, in order, into the answer.
+def merge(summaries):
+    best = -math.inf
+    offset = 0
+    far = math.inf
+    tail = None
+    for total, internal, max_p, min_head, head, chunk_tail in summaries:
+        best = max(best, internal)
+        if far != math.inf:
+            best = max(best, offset + max_p - far)
+        if tail is not None and len(tail):
+            best = max(best, (offset + head - tail).max().item())
+            far = min(far, tail.min().item())
+        far = min(far, offset + min_head)
+        tail = offset + chunk_tail
+        offset += total
+    return best
+
+
+# Return the tasks of summarize() for an array of |N| elements split into at
+# most |chunks| chunks. Every chunk must be at least K long.
+def split(N, K, chunks):
+    chunks = max(1, min(chunks, N // K))
+    bounds = [N * c // chunks for c in range(chunks + 1)]
+    return [(bounds[c], bounds[c + 1], K) for c in range(chunks)]
+
+
+# Return the maximum sum of a subarray of |L| whose length is at least |K|,
+# solved by |processes| worker processes (the number of CPUs if None).
+# Integer arrays are summed as int64 and the others as float64.
+def solve_parallel(L, K, processes=None, chunks=None):
+    L = np.asarray(L)
+    if np.issubdtype(L.dtype, np.integer) or L.dtype == bool:
+        L = L.astype(np.int64, copy=False)
+    else:
+        L = L.astype(np.float64, copy=False)
+    N = len(L)
+    assert(1 <= K <= N)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if chunks is None:
+        chunks = processes * CHUNKS_PER_PROCESS
+    tasks = split(N, K, chunks)
+
+    memory = shared_memory.SharedMemory(create=True, size=max(L.nbytes, 1))
+    try:
+        np.ndarray(N, dtype=L.dtype, buffer=memory.buf)[:] = L
+        with multiprocessing.Pool(processes, initializer=init_worker,
+                                  initargs=(memory.name, N,
+                                            L.dtype.str)) as pool:
+            summaries = pool.map(summarize, tasks)
+    finally:
+        memory.close()
+        memory.unlink()
+    return merge(summaries)
+
+
+# For a given L and K, check that the merged summaries answer the same as
+# solve_n() for several numbers of chunks. The chunks are summarized in this
+# process.
+def check_answers(L, K):
+    global worker_array
+    answer_n = solve_n(L, K)
+    worker_array = np.array(L, dtype=np.int64)
+    for chunks in (1, 2, 3, len(L)):
+        answer = merge([summarize(task)
+                        for task in split(len(L), K, chunks)])
+        if answer != answer_n:
+            print(L, K, chunks)
+            print("Correct answer is %d but the parallel algorithm answered "
+                  "%d" % (answer_n, answer))
+            exit(0)
+
+
+# Run tests.
+def run_tests():
+    check_answers([2, -1, -1, -1, 4, -1, 3, 1], 3)
+
+    # Generate many test cases and run.
+    for iteration in range(1000):
+        length = random.randint(1, 30)
+        L = [random.randint(-10, 10) for i in range(length)]
+        for K in range(1, length + 1):
+            check_answers(L, K)
+
+    # Through shared memory and worker processes.
+    for iteration in range(5):
+        L = [random.randint(-10, 10) for i in range(1000)]
+        for K in (1, 10, 300, 1000):
+            assert(solve_parallel(L, K, 2) == solve_n(L, K))
+    assert(solve_parallel([0.5, -1.0, 2.0], 2, 2) ==
+           solve_n([0.5, -1.0, 2.0], 2))
+    print("All tests pass!")
+
+
+# Measure the speedup of solve_parallel() over solve_n() on a random array of
+# |N| integers, for 1, 2, 4, ... processes up to the number of CPUs.
+def benchmark(N, K):
+    L = np.random.randint(-1000, 1000, size=N, dtype=np.int64)
+    values = L.tolist()
+    start = time.perf_counter()
+    answer_n = solve_n(values, K)
+    n_time = time.perf_counter() - start
+    print("N=%d K=%d: solve_n %.3f s (%d CPUs)" % (
+        N, K, n_time, multiprocessing.cpu_count()))
+    processes = 1
+    while True:
+        start = time.perf_counter()
+        answer = solve_parallel(L, K, processes)
+        parallel_time = time.perf_counter() - start
+        assert(answer == answer_n)
+        print("  %d processes: %.3f s (%.1fx)" % (
+            processes, parallel_time, n_time / parallel_time))
+        if processes >= multiprocessing.cpu_count():
+            break
+        processes = min(2 * processes, multiprocessing.cpu_count())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        benchmark(int(sys.argv[1]), int(sys.argv[2]))
+    elif len(sys.argv) == 1:
+        run_tests()
+    else:
+        print("usage: %s [N K]" % sys.argv[0])
+        exit(1)
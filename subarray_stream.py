@@ -0,0 +1,232 @@
+import itertools, os, pickle, random, sys, tempfile
+import numpy as np
+from subarray_expected import solve_n
+
+# The maximum subarray with length >= K over a stream of int64 values, in one
+# sequential pass with O(K) memory.
+#
+# This uses the same prefix sums as subarray_numpy.py: with P[0] = 0 and
+# P[j] = L[0] + ... + L[j-1], the answer is
+#
+#   max over j = K, ..., N of (P[j] - min(P[0], ..., P[j-K]))
+#
+# P[t] is needed for the running minimum only K elements after it is
+# calculated, so the solver keeps the last (at most K) prefix sums that are
+# not in the running minimum yet, plus a few numbers. The values are consumed
+# in chunks, and every chunk is processed with NumPy.
+#
+# The state can be saved to a checkpoint file and loaded again, so a pass over
+# a large file can be resumed after it is stopped.
+
+# The number of values read at once.
+CHUNK = 1 << 20
+
+
+# The state of the pass.
+#
+# |self.K|: The minimum length of the subarray.
+# |self.consumed|: The number of values consumed so far (n).
+# |self.prefix|: P[n].
+# |self.pending|: P[t] for n - K < t <= n (t >= 0), as an int64 array.
+# |self.minimum|: min(P[0], ..., P[n-K]), or None if n < K.
+# |self.best|: The maximum sum so far, or None if n < K.
+class StreamingSolver:
+    def __init__(self, K):
+        assert(K >= 1)
+        self.K = K
+        self.consumed = 0
+        self.prefix = 0
+        self.pending = np.zeros(1, dtype=np.int64)
+        self.minimum = None
+        self.best = None
+
+    # Consume |values| (an int64 array or a list of integers).
+    def feed(self, values):
+        values = np.asarray(values, dtype=np.int64)
+        if len(values) == 0:
+            return
+        K = self.K
+        n = self.consumed
+        prefix = np.cumsum(values)
+        prefix += self.prefix
+        # sums[i] is P[first + i], where P[first] is the first pending one.
+        sums = np.concatenate((self.pending, prefix))
+        first = n - len(self.pending) + 1
+        # P[first], ..., P[n + len(values) - K] join the running minimum.
+        count = n + len(values) - K - first + 1
+        if count > 0:
+            running = np.minimum.accumulate(sums[:count])
+            if self.minimum is not None:
+                np.minimum(running, self.minimum, out=running)
+            # The best sum of the subarrays that end at j is
+            # P[j] - running[j - K - first].
+            j = max(n + 1, K)
+            best = int(np.max(prefix[j - n - 1:] -
+                              running[j - K - first:]))
+            if self.best is None or best > self.best:
+                self.best = best
+            self.minimum = int(running[-1])
+            self.pending = sums[count:].copy()
+        else:
+            self.pending = sums
+        self.prefix = int(prefix[-1])
+        self.consumed = n + len(values)
+
+    # Return the maximum sum of the values consumed so far.
+    def result(self):
+        assert(self.best is not None)
+        return self.best
+
+    # Save the state to |file|. |tag| identifies what the state is valid for,
+    # e.g. the input file. The state is written to a uniquely named temporary
+    # file and renamed, so that a reader never sees a partially written file
+    # and concurrent savers do not write to the same file.
+    def save(self, file, tag=None):
+        descriptor, temporary_file = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(file)), suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                pickle.dump((tag, self.__dict__), f)
+            os.replace(temporary_file, file)
+        except BaseException:
+            os.remove(temporary_file)
+            raise
+
+    # Return the StreamingSolver saved to |file| by save(), or None if it was
+    # saved with a different |tag|.
+    @staticmethod
+    def load(file, tag=None):
+        with open(file, 'rb') as f:
+            saved_tag, state = pickle.load(f)
+        if saved_tag != tag:
+            return None
+        solver = StreamingSolver.__new__(StreamingSolver)
+        solver.__dict__.update(state)
+        return solver
+
+
+# Return the maximum sum of a subarray with length >= |K| of the integers in
+# |iterable|.
+def solve_iterable(iterable, K, chunk=CHUNK):
+    solver = StreamingSolver(K)
+    iterator = iter(iterable)
+    while True:
+        values = np.fromiter(itertools.islice(iterator, chunk),
+                             dtype=np.int64)
+        if len(values) == 0:
+            break
+        solver.feed(values)
+    return solver.result()
+
+
+# Return the maximum sum of |array|, which can be a np.memmap of int64.
+def solve_array(array, K, chunk=CHUNK):
+    solver = StreamingSolver(K)
+    for begin in range(0, len(array), chunk):
+        solver.feed(array[begin:begin + chunk])
+    return solver.result()
+
+
+# Return the maximum sum of the little-endian int64 values in |file|.
+# |checkpoint_file|: If not None, the state is saved to this file every
+#                    |checkpoint_every| chunks, and the pass resumes from it
+#                    if it exists. The checkpoint records the path, the size
+#                    and the mtime of |file| and K, and the pass starts over
+#                    if they do not match.
+def solve_file(file, K, chunk=CHUNK, checkpoint_file=None,
+               checkpoint_every=64):
+    stat = os.stat(file)
+    tag = (os.path.abspath(file), stat.st_size, stat.st_mtime_ns, K)
+    solver = None
+    if checkpoint_file is not None and os.path.exists(checkpoint_file):
+        solver = StreamingSolver.load(checkpoint_file, tag)
+    if solver is None:
+        solver = StreamingSolver(K)
+    with open(file, 'rb') as f:
+        f.seek(solver.consumed * 8)
+        chunks = 0
+        while True:
+            values = np.fromfile(f, dtype='<i8', count=chunk)
+            if len(values) == 0:
+                break
+            solver.feed(values)
+            chunks += 1
+            if checkpoint_file is not None and chunks % checkpoint_every == 0:
+                solver.save(checkpoint_file, tag)
+    if checkpoint_file is not None:
+        solver.save(checkpoint_file, tag)
+    return solver.result()
+
+
+# For a given L and K, check that the streaming solvers answer the same as
+# solve_n().
+def check_answers(L, K, chunk):
+    answer_n = solve_n(L, K)
+    answers = [solve_iterable(L, K, chunk), solve_array(np.array(L), K, chunk)]
+    # Stop in the middle, save a checkpoint and resume.
+    solver = StreamingSolver(K)
+    middle = random.randint(0, len(L))
+    solver.feed(L[:middle])
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint_file = os.path.join(directory, 'checkpoint')
+        solver.save(checkpoint_file)
+        solver = StreamingSolver.load(checkpoint_file)
+    solver.feed(L[middle:])
+    answers.append(solver.result())
+    for answer in answers:
+        if answer != answer_n:
+            print(L, K, chunk)
+            print("Correct answer is %d but the streaming algorithm "
+                  "answered %d" % (answer_n, answer))
+            exit(0)
+
+
+# Run tests.
+def run_tests():
+    check_answers([2, -1, -1, -1, 4, -1, 3, 1], 3, 2)
+
+    # Generate many test cases and run.
+    for iteration in range(300):
+        length = random.randint(1, 30)
+        L = [random.randint(-10, 10) for i in range(length)]
+        for K in range(1, length + 1):
+            check_answers(L, K, random.randint(1, length + 1))
+
+    # A binary file with checkpoints.
+    L = [random.randint(-1000, 1000) for i in range(10000)]
+    with tempfile.TemporaryDirectory() as directory:
+        file = os.path.join(directory, 'values')
+        np.array(L, dtype='<i8').tofile(file)
+        checkpoint_file = os.path.join(directory, 'checkpoint')
+        for K in (1, 7, 5000, 10000):
+            if os.path.exists(checkpoint_file):
+                os.remove(checkpoint_file)
+            assert(solve_file(file, K, 100, checkpoint_file, 3) ==
+                   solve_n(L, K))
+            # Resume from the finished checkpoint.
+            assert(solve_file(file, K, 100, checkpoint_file, 3) ==
+                   solve_n(L, K))
+            assert(solve_array(np.memmap(file, dtype='<i8', mode='r'), K,
+                               333) == solve_n(L, K))
+
+        # The checkpoint of another K or of the file before it was rewritten
+        # is not resumed.
+        assert(solve_file(file, 3, 100, checkpoint_file, 3) == solve_n(L, 3))
+        L = [random.randint(-1000, 1000) for i in range(10000)]
+        np.array(L, dtype='<i8').tofile(file)
+        stat = os.stat(file)
+        os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        assert(solve_file(file, 3, 100, checkpoint_file, 3) == solve_n(L, 3))
+    print("All tests pass!")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) in (3, 4):
+        print(solve_file(sys.argv[1], int(sys.argv[2]),
+                         checkpoint_file=sys.argv[3] if len(sys.argv) == 4
+                         else None))
+    elif len(sys.argv) == 1:
+        run_tests()
+    else:
+        print("usage: %s [int64_file K [checkpoint_file]]" % sys.argv[0])
+        exit(1)